@@ -25,12 +25,18 @@ for f in test/positive/*.mut; do
 done
 
 # ── Negative tests: must be rejected by the compiler ──
+# An optional "# expect-error: <text>" line pins the diagnostic as well
 for f in test/negative/*.mut; do
     name=$(basename "$f")
-    if python3 tools/reference-compiler/main.py "$f" 2>/dev/null; then
+    want=$(sed -n 's/^# expect-error: //p' "$f" | head -n 1)
+    if out=$(python3 tools/reference-compiler/main.py "$f" 2>&1); then
         echo "  FAIL  $name (should have been rejected)"
         fail=$((fail + 1))
         errors="$errors  $name\n"
+    elif [ -n "$want" ] && ! grep -qF -- "$want" <<< "$out"; then
+        echo "  FAIL  $name (wrong diagnostic)"
+        fail=$((fail + 1))
+        errors="$errors  $name\n"
     else
         echo "  PASS  $name (correctly rejected)"
         pass=$((pass + 1))
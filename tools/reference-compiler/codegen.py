@@ -120,9 +120,9 @@ def _fn_param_types(ty: str) -> List[str]:
     depth = 0
     start = 0
     for i, ch in enumerate(inner):
-        if ch == '(':
+        if ch in "([":
             depth += 1
-        elif ch == ')':
+        elif ch in ")]":
             depth -= 1
         elif ch == ',' and depth == 0:
             parts.append(inner[start:i])
@@ -1006,13 +1006,29 @@ class CodeGen:
         if not self.used_fn_types:
             return
         self.w("// ---- function pointer typedefs ----")
+
+        # List/Dict structs are instantiated after these typedefs, so Fn types
+        # that take or return one refer to it through a forward-declared tag
+        def fn_c_type(t: str) -> str:
+            if _is_list_type(t) or _is_dict_type(t):
+                return "struct " + c_type(t)
+            return c_type(t)
+
+        fwd: Set[str] = set()
+        for fn_ty in self.used_fn_types:
+            for t in _fn_param_types(fn_ty) + [_fn_ret_type(fn_ty)]:
+                if _is_list_type(t) or _is_dict_type(t):
+                    fwd.add(c_type(t)[:-1])
+        for name in sorted(fwd):
+            self.w(f"struct {name};")
+
         for fn_ty in sorted(self.used_fn_types):
             params = _fn_param_types(fn_ty)
             ret = _fn_ret_type(fn_ty)
             td_name = _fn_typedef_name(fn_ty)
-            ret_c = c_type(ret)
+            ret_c = fn_c_type(ret)
             if params:
-                params_c = ", ".join(c_type(p) for p in params)
+                params_c = ", ".join(fn_c_type(p) for p in params)
             else:
                 params_c = "void"
             self.w(f"typedef {ret_c} (*{td_name})({params_c});")
@@ -1,6 +1,7 @@
 from __future__ import annotations
+import sys
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional
 
 from lexer import Token, SrcLoc
 
@@ -18,7 +19,7 @@ def _split_dict_tp(tp: str):
         elif ch in ")]":
             depth -= 1
         elif ch == "," and depth == 0:
-            return tp[:i], tp[i+1:]
+            return sys.intern(tp[:i]), sys.intern(tp[i+1:])
     raise ValueError(f"invalid dict type params: {tp}")
 
 
@@ -42,7 +43,7 @@ class ParseError(Exception):
 # AST Types
 # -------------------------
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class TypeRef:
     loc: SrcLoc
     name: str  # e.g. "i64", "f64", "bool", "str", "ListI64", "DictStrI64"
@@ -52,86 +53,94 @@ class TypeRef:
 # AST Expressions
 # -------------------------
 
+# Expression and statement nodes use __slots__: generic instantiation clones
+# whole bodies of them. Expr also reserves the attributes the type checker
+# stamps on each node for codegen (ty, and lhs_ty for is/as).
 @dataclass
 class Expr:
+    __slots__ = ("loc", "ty", "lhs_ty")
     loc: SrcLoc
+    if TYPE_CHECKING:
+        # Set by the type checker, not constructor fields
+        ty: str = field(init=False)
+        lhs_ty: str = field(init=False)
 
-@dataclass
+@dataclass(slots=True)
 class EInt(Expr):
     value: int
 
-@dataclass
+@dataclass(slots=True)
 class EFloat(Expr):
     value: float
 
-@dataclass
+@dataclass(slots=True)
 class EString(Expr):
     raw: str  # includes quotes; unescape later
 
-@dataclass
+@dataclass(slots=True)
 class EChar(Expr):
     raw: str  # includes quotes; unescape later
 
-@dataclass
+@dataclass(slots=True)
 class EBool(Expr):
     value: bool
 
-@dataclass
+@dataclass(slots=True)
 class ENone(Expr):
     pass
 
-@dataclass
+@dataclass(slots=True)
 class EVar(Expr):
     name: str
 
-@dataclass
+@dataclass(slots=True)
 class EUnary(Expr):
     op: str
     rhs: Expr
 
-@dataclass
+@dataclass(slots=True)
 class EBinary(Expr):
     op: str
     lhs: Expr
     rhs: Expr
 
-@dataclass
+@dataclass(slots=True)
 class ECall(Expr):
     callee: Expr
     args: List[Expr]
     type_param: Optional[str] = None
 
-@dataclass
+@dataclass(slots=True)
 class EMemberAccess(Expr):
     obj: Expr
     member: str
 
-@dataclass
+@dataclass(slots=True)
 class EIs(Expr):
     expr: Expr
     type_name: str  # RHS type name (e.g. "i64", "Circle", "Shape")
 
-@dataclass
+@dataclass(slots=True)
 class EAs(Expr):
     expr: Expr
     type_name: str  # target type name for downcast (e.g. "Circle")
 
-@dataclass
+@dataclass(slots=True)
 class EIndex(Expr):
     obj: Expr
     index: Expr
 
-@dataclass
+@dataclass(slots=True)
 class ETuple(Expr):
     elems: List[Expr]
 
-@dataclass
+@dataclass(slots=True)
 class EListLit(Expr):
     """List[T]() {elem1, elem2, ...} — list constructor with initializer."""
     elem_type: str              # e.g. "i64", "str"
     elems: List[Expr]
 
-@dataclass
+@dataclass(slots=True)
 class EDictLit(Expr):
     """Dict[K,V]() {key: val, ...} — dict constructor with initializer."""
     key_type: str               # e.g. "str", "i64"
@@ -146,9 +155,10 @@ class EDictLit(Expr):
 
 @dataclass
 class Stmt:
+    __slots__ = ("loc",)
     loc: SrcLoc
 
-@dataclass
+@dataclass(slots=True)
 class SVarDecl(Stmt):
     name: str
     ty: Optional[TypeRef]   # None for := shorthand (type inferred)
@@ -156,74 +166,74 @@ class SVarDecl(Stmt):
     is_const: bool = False
     is_static: bool = False
 
-@dataclass
+@dataclass(slots=True)
 class STupleDestructure(Stmt):
     names: List[str]
     value: Expr
 
-@dataclass
+@dataclass(slots=True)
 class SAssign(Stmt):
     name: str
     op: str   # "=", "+=", ...
     value: Expr
 
-@dataclass
+@dataclass(slots=True)
 class SMemberAssign(Stmt):
     obj: Expr
     member: str
     op: str   # "=", "+=", ...
     value: Expr
 
-@dataclass
+@dataclass(slots=True)
 class SIndexAssign(Stmt):
     obj: Expr
     index: Expr
     op: str   # "=" only for now
     value: Expr
 
-@dataclass
+@dataclass(slots=True)
 class SExpr(Stmt):
     expr: Expr
 
-@dataclass
+@dataclass(slots=True)
 class SReturn(Stmt):
     value: Optional[Expr]
 
-@dataclass
+@dataclass(slots=True)
 class SBreak(Stmt):
     pass
 
-@dataclass
+@dataclass(slots=True)
 class SContinue(Stmt):
     pass
 
-@dataclass
+@dataclass(slots=True)
 class SBlock(Stmt):
     stmts: List[Stmt]
 
-@dataclass
+@dataclass(slots=True)
 class IfArm:
     loc: SrcLoc
     cond: Optional[Expr]   # None for else
     block: SBlock
 
-@dataclass
+@dataclass(slots=True)
 class SIf(Stmt):
     arms: List[IfArm]      # if + elif* + optional else
 
-@dataclass
+@dataclass(slots=True)
 class SWhile(Stmt):
     cond: Expr
     body: SBlock
 
-@dataclass
+@dataclass(slots=True)
 class SFor(Stmt):
     var_name: str
     var_ty: TypeRef     # explicit element type annotation
     iterable: Expr     # any expression that evaluates to a list type
     body: SBlock
 
-@dataclass
+@dataclass(slots=True)
 class Param:
     loc: SrcLoc
     name: str
@@ -744,6 +754,7 @@ class Parser:
         return Param(loc=name.loc, name=name.lexeme, ty=ty)
 
     def parse_type_ref(self) -> TypeRef:
+        # Type names are interned (see typecheck._intern)
         # Tuple type: (T1, T2, T3)
         if self.peek().kind == "(":
             return self._parse_tuple_type()
@@ -767,7 +778,7 @@ class Parser:
                 ret_ref = self.parse_type_ref()
                 ret_name = ret_ref.name
             encoded = f"Fn({','.join(param_names)})->{ret_name}"
-            return TypeRef(loc=t.loc, name=encoded)
+            return TypeRef(loc=t.loc, name=sys.intern(encoded))
         # Dotted type: module.Type (e.g. shapes.Circle)
         if self.peek().kind == "." and self.peek(1).kind == "IDENT":
             self.advance()  # consume '.'
@@ -778,15 +789,15 @@ class Parser:
             self.expect("[", "expected '[' after List")
             inner = self.parse_type_ref()
             self.expect("]", "expected ']' to close generic type")
-            return TypeRef(loc=t.loc, name=f"List[{inner.name}]")
+            return TypeRef(loc=t.loc, name=sys.intern(f"List[{inner.name}]"))
         if name == "Dict" and self.peek().kind == "[":
             self.expect("[", "expected '[' after Dict")
             key_ref = self.parse_type_ref()
             self.expect(",", "expected ',' between Dict key and value types")
             val_ref = self.parse_type_ref()
             self.expect("]", "expected ']' to close generic type")
-            return TypeRef(loc=t.loc, name=f"Dict[{key_ref.name},{val_ref.name}]")
-        return TypeRef(loc=t.loc, name=name)
+            return TypeRef(loc=t.loc, name=sys.intern(f"Dict[{key_ref.name},{val_ref.name}]"))
+        return TypeRef(loc=t.loc, name=sys.intern(name))
 
     def _parse_tuple_type(self) -> TypeRef:
         """Parse tuple type: (T1, T2, T3)"""
@@ -798,7 +809,7 @@ class Parser:
         if len(types) < 2:
             raise ParseError(lparen, "tuple type must have at least 2 elements")
         name = "(" + ",".join(t.name for t in types) + ")"
-        return TypeRef(loc=lparen.loc, name=name)
+        return TypeRef(loc=lparen.loc, name=sys.intern(name))
 
     # -------------------------
     # Statements
@@ -1046,7 +1057,7 @@ class Parser:
                         self.advance()  # consume ','
                         inner2 = self.parse_type_ref()
                         self.expect("]", "expected ']' to close type parameters")
-                        type_param = f"{inner.name},{inner2.name}"
+                        type_param = sys.intern(f"{inner.name},{inner2.name}")
                     else:
                         self.expect("]", "expected ']' to close type parameter")
                         type_param = inner.name
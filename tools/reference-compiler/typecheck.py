@@ -1,9 +1,11 @@
 from __future__ import annotations
-import copy
 import sys
+from collections import deque
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
 
+from lexer import SrcLoc
 from parser import (
     Program, FuncDecl, ClassDecl, StructDecl, FieldDecl, Param, TypeRef, InterfaceDecl, MethodSig, EnumDecl,
     Stmt, SVarDecl, SAssign, SMemberAssign, SIndexAssign, SExpr, SReturn, SBreak, SContinue, SIf, SWhile, SFor, SBlock, IfArm,
@@ -27,124 +29,206 @@ INT_TYPES = {"i8", "i16", "i32", "i64", "u8", "u16", "u32", "u64"}
 FLOAT_TYPES = {"f32", "f64"}
 NUM_TYPES = INT_TYPES | FLOAT_TYPES
 
+# Type classification bits for operator checks: one dict probe and a bit test
+# replace enum resolution plus set membership. Enum names are added per checker
+# (as _TC_INT | _TC_ENUM, since enums are i64 underneath).
+_TC_INT = 1
+_TC_FLOAT = 2
+_TC_BOOL = 4
+_TC_STR = 8
+_TC_ENUM = 16
+_TC_NUM = _TC_INT | _TC_FLOAT
+_TC_PRINTABLE = _TC_NUM | _TC_BOOL | _TC_STR
+_TY_CLASS: Dict[str, int] = {
+    **{t: _TC_INT for t in INT_TYPES},
+    **{t: _TC_FLOAT for t in FLOAT_TYPES},
+    "bool": _TC_BOOL,
+    "str": _TC_STR,
+}
+
 # Type cast builtins: type name -> set of source types it can cast from
 CAST_TYPES = {"i8", "i16", "i32", "i64", "u8", "u16", "u32", "u64", "f32", "f64"}
 
+# Type strings are interned wherever they are registered, built or split out
+# of a composite, so equal types share one object and == short-circuits on
+# identity. The decomposition helpers below are pure functions of the type
+# string and are asked about the same few types over and over, so each is
+# memoized; list-returning ones cache a tuple and hand out a fresh list.
+_intern = sys.intern
+
 def is_list_type(ty: str) -> bool:
     return ty.startswith("List[") and ty.endswith("]")
 
+@lru_cache(maxsize=None)
 def list_elem_type(ty: str) -> str:
     """List[i64] -> i64, List[Person] -> Person"""
-    return ty[5:-1]
+    return _intern(ty[5:-1])
 
 def is_dict_type(ty: str) -> bool:
     return ty.startswith("Dict[") and ty.endswith("]")
 
-def _split_dict_inner(inner: str):
-    """Split 'K,V' into (K, V), handling nested types."""
+def _split_top_level(inner: str, maxsplit: int = -1) -> List[str]:
+    """Split a comma-separated type list at nesting depth 0.
+    'i64,List[str],(i64,bool)' -> ['i64', 'List[str]', '(i64,bool)']"""
+    # Flat lists (the common case) need no depth tracking
+    if "(" not in inner and "[" not in inner:
+        return inner.split(",", maxsplit)
+    # Split on every comma, then glue pieces back together while brackets are
+    # still open -- the bracket counting runs in C via str.count
+    parts: List[str] = []
     depth = 0
-    for i, ch in enumerate(inner):
-        if ch in "([":
-            depth += 1
-        elif ch in ")]":
-            depth -= 1
-        elif ch == "," and depth == 0:
-            return inner[:i], inner[i+1:]
-    raise ValueError(f"invalid dict inner: {inner}")
+    cur: Optional[str] = None
+    for piece in inner.split(","):
+        cur = piece if cur is None else cur + "," + piece
+        depth += piece.count("(") + piece.count("[") - piece.count(")") - piece.count("]")
+        if depth == 0:
+            parts.append(cur)
+            cur = None
+    if cur is not None:
+        parts.append(cur)
+    if 0 <= maxsplit < len(parts) - 1:
+        parts[maxsplit:] = [",".join(parts[maxsplit:])]
+    return parts
+
+@lru_cache(maxsize=None)
+def _split_dict_inner(inner: str) -> Tuple[str, str]:
+    """Split 'K,V' into (K, V), handling nested types."""
+    parts = _split_top_level(inner, 1)
+    if len(parts) != 2:
+        raise ValueError(f"invalid dict inner: {inner}")
+    return _intern(parts[0]), _intern(parts[1])
 
+@lru_cache(maxsize=None)
 def dict_key_type(ty: str) -> str:
     """Dict[str,i64] -> str"""
     k, _ = _split_dict_inner(ty[5:-1])
     return k
 
+@lru_cache(maxsize=None)
 def dict_val_type(ty: str) -> str:
     """Dict[str,i64] -> i64"""
     _, v = _split_dict_inner(ty[5:-1])
     return v
 
+@lru_cache(maxsize=4096)
+def _type_shape(ty: str) -> Optional[Tuple[str, Tuple[str, ...]]]:
+    """Decompose a composite type once: List[T] -> ("list", (T,)),
+    Dict[K,V] -> ("dict", (K, V)), (A,B) -> ("tuple", (A, B)), else None."""
+    if is_list_type(ty):
+        return ("list", (_intern(ty[5:-1]),))
+    if is_dict_type(ty):
+        return ("dict", _split_dict_inner(ty[5:-1]))
+    if is_tuple_type(ty):
+        return ("tuple", _tuple_elems(ty))
+    return None
+
 def is_fn_type(ty: str) -> bool:
     return ty.startswith("Fn(") and ")->" in ty
 
 def is_tuple_type(ty: str) -> bool:
     return len(ty) >= 5 and ty[0] == "(" and ty[-1] == ")"
 
+@lru_cache(maxsize=None)
+def _tuple_elems(ty: str) -> Tuple[str, ...]:
+    return tuple(_intern(t) for t in _split_top_level(ty[1:-1]))
+
 def tuple_elem_types(ty: str) -> List[str]:
     """(i64,str,bool) -> ['i64', 'str', 'bool']"""
-    inner = ty[1:-1]
-    parts: List[str] = []
-    depth = 0
-    start = 0
-    for i, ch in enumerate(inner):
-        if ch in "([":
-            depth += 1
-        elif ch in ")]":
-            depth -= 1
-        elif ch == "," and depth == 0:
-            parts.append(inner[start:i])
-            start = i + 1
-    parts.append(inner[start:])
-    return parts
+    return list(_tuple_elems(ty))
 
-def fn_param_types(ty: str) -> List[str]:
-    """Fn(i64,str)->bool -> ['i64', 'str']"""
+@lru_cache(maxsize=None)
+def _fn_params(ty: str) -> Tuple[str, ...]:
     inner = ty[3:ty.index(")->")]
     if not inner:
-        return []
-    # Parse respecting nested Fn() types
-    parts: List[str] = []
-    depth = 0
-    start = 0
-    for i, ch in enumerate(inner):
-        if ch == '(':
-            depth += 1
-        elif ch == ')':
-            depth -= 1
-        elif ch == ',' and depth == 0:
-            parts.append(inner[start:i])
-            start = i + 1
-    parts.append(inner[start:])
-    return parts
+        return ()
+    return tuple(_intern(t) for t in _split_top_level(inner))
+
+def fn_param_types(ty: str) -> List[str]:
+    """Fn(i64,str)->bool -> ['i64', 'str']"""
+    return list(_fn_params(ty))
 
+@lru_cache(maxsize=None)
 def fn_ret_type(ty: str) -> str:
     """Fn(i64,str)->bool -> 'bool'"""
-    return ty[ty.index(")->") + 3:]
+    return _intern(ty[ty.index(")->") + 3:])
 
-# Builtin function signatures: name -> ([param_types], return_type)
-BUILTIN_SIGS: Dict[str, Tuple[List[str], str]] = {}
+# Composite type-string builders. The same few types are rebuilt constantly
+# (every list literal, tuple, function-pointer reference), so each distinct
+# result is built and interned once.
+@lru_cache(maxsize=None)
+def _list_ty(elem: str) -> str:
+    return _intern(f"List[{elem}]")
 
-# Generic container ops: name -> lambda(type_param) -> ([param_types], return_type)
+
+@lru_cache(maxsize=None)
+def _dict_ty(key: str, val: str) -> str:
+    return _intern(f"Dict[{key},{val}]")
+
+
+@lru_cache(maxsize=None)
+def _tuple_ty(elems: Tuple[str, ...]) -> str:
+    return _intern("(" + ",".join(elems) + ")")
+
+
+@lru_cache(maxsize=None)
+def _fn_ty(param_tys: Tuple[str, ...], ret_ty: str) -> str:
+    return _intern(f"Fn({','.join(param_tys)})->{ret_ty}")
+
+# Generic container ops: name -> ((param_types...), return_type) templates.
 # Used for List[T](), append[T](), get[T](), Dict[T](), put[T](), lookup[T](), etc.
-GENERIC_CONTAINER_OPS: Dict[str, object] = {
-    "List":    lambda tp: ([], f"List[{tp}]"),
-    "append":  lambda tp: ([f"List[{tp}]", tp], "void"),
-    "get":     lambda tp: ([f"List[{tp}]", "i64"], tp),
-    "set":     lambda tp: ([f"List[{tp}]", "i64", tp], "void"),
-    "pop":     lambda tp: ([f"List[{tp}]"], tp),
-    "remove":  lambda tp: ([f"List[{tp}]", "i64"], "void"),
-    "Dict":    lambda tp: ([], f"Dict[{tp}]"),
-    "put":     lambda tp: ([f"Dict[{tp}]", _split_dict_inner(tp)[0], _split_dict_inner(tp)[1]], "void"),
-    "lookup":  lambda tp: ([f"Dict[{tp}]", _split_dict_inner(tp)[0]], _split_dict_inner(tp)[1]),
-    "has":     lambda tp: ([f"Dict[{tp}]", _split_dict_inner(tp)[0]], "bool"),
+# Placeholders: "$T" element type, "$K"/"$V" dict key/value, "$L" List[T],
+# "$D" Dict[K,V]. Materialized per type parameter by _container_op_sig.
+GENERIC_CONTAINER_OPS: Dict[str, Tuple[Tuple[str, ...], str]] = {
+    "List":    ((), "$L"),
+    "append":  (("$L", "$T"), "void"),
+    "get":     (("$L", "i64"), "$T"),
+    "set":     (("$L", "i64", "$T"), "void"),
+    "pop":     (("$L",), "$T"),
+    "remove":  (("$L", "i64"), "void"),
+    "Dict":    ((), "$D"),
+    "put":     (("$D", "$K", "$V"), "void"),
+    "lookup":  (("$D", "$K"), "$V"),
+    "has":     (("$D", "$K"), "bool"),
 }
 
+
+@lru_cache(maxsize=2048)
+def _container_op_sig(name: str, tp: str) -> Tuple[Tuple[str, ...], str, str]:
+    """Materialize the GENERIC_CONTAINER_OPS template for name with type param tp.
+    Also returns the "name[tp]" spelling used in diagnostics."""
+    param_tpl, ret_tpl = GENERIC_CONTAINER_OPS[name]
+    if name in _DICT_GENERIC_OPS or name == "Dict":
+        k, v = _split_dict_inner(tp)
+        subst = {"$D": _dict_ty(k, v), "$K": k, "$V": v}
+    else:
+        subst = {"$L": _list_ty(tp), "$T": tp}
+    return tuple(subst.get(s, s) for s in param_tpl), subst.get(ret_tpl, ret_tpl), f"{name}[{tp}]"
+
 # Mapping for type inference: which generic ops work on lists vs dicts
 _LIST_GENERIC_OPS = {"append", "get", "set", "pop", "remove"}
 _DICT_GENERIC_OPS = {"put", "lookup", "has"}
 
-# Allowed dict key types: integers, str, bool, enums
+# Assignment operator categories: plain store, numeric compound, integer-only compound
+_OP_PLAIN, _OP_NUM, _OP_INT = 0, 1, 2
+_OP_CATEGORY: Dict[str, int] = {
+    "=": _OP_PLAIN,
+    "+=": _OP_NUM, "-=": _OP_NUM, "*=": _OP_NUM, "/=": _OP_NUM, "%=": _OP_NUM,
+    "&=": _OP_INT, "|=": _OP_INT, "^=": _OP_INT, "<<=": _OP_INT, ">>=": _OP_INT,
+}
+
+# Allowed dict key types: integers, str, bool
 _HASHABLE_BASE = INT_TYPES | {"str", "bool"}
 
-def _check_dict_key_type(loc, kty: str, checker) -> None:
+def _check_dict_key_type(loc: SrcLoc, kty: str) -> None:
     """Validate that kty is an allowed dict key type."""
-    if kty in _HASHABLE_BASE:
-        return
-    if hasattr(checker, 'enums') and kty in checker.enums:
-        return
-    raise TypeError(loc, f"type '{kty}' cannot be used as dict key (allowed: integers, str, bool, enums)")
+    # Enum keys are not accepted: codegen has no list/dict instantiation for
+    # enum element types yet, so use an i64 key holding the variant instead.
+    if kty not in _HASHABLE_BASE:
+        raise TypeError(loc, f"type '{kty}' cannot be used as dict key (allowed: integers, str, bool)")
 
 
 class TypeError(Exception):
-    def __init__(self, loc, msg: str):
+    def __init__(self, loc: SrcLoc, msg: str) -> None:
         self.loc = loc
         self.msg = msg
         super().__init__(self.__str__())
@@ -153,97 +237,18 @@ class TypeError(Exception):
         return f"{self.loc.file}:{self.loc.line}:{self.loc.col}: type error: {self.msg}"
 
 
-
-def _is_ref_type(t: str) -> bool:
-    if t == "str":
-        return True
-    if is_list_type(t) or is_dict_type(t):
-        return True
-    if t in _USER_CLASS_NAMES:
-        return True
-    if t in _USER_INTERFACE_NAMES:
-        return True
-    return False
-
-
-def _is_truthy_type(t: str) -> bool:
-    """Returns True if this type can be used in boolean contexts (if, while, not, and, or).
-    Truthy types: bool, all integers, all ref types (None is falsy)."""
-    if t == "bool":
-        return True
-    if _resolve_enum_ty(t) in INT_TYPES:
-        return True
-    if _is_ref_type(t):
-        return True
-    return False
-
-# Set of registered user class names (populated during check())
-_USER_CLASS_NAMES: set = set()
-# Set of registered struct names (populated during check())
-_USER_STRUCT_NAMES: set = set()
-# Set of registered interface names (populated during check())
-_USER_INTERFACE_NAMES: set = set()
-# Set of registered enum type names (populated during check())
-_USER_ENUM_NAMES: set = set()
-# Mapping: class name -> set of interface names it implements
-_CLASS_IMPLEMENTS: Dict[str, set] = {}
-
-
-# none is assignable to any reference type
-# class is assignable to any interface it implements
-def _assignable(src_ty: str, dst_ty: str) -> bool:
-    if src_ty == dst_ty:
-        return True
-    # Enum types are interchangeable with i64
-    if _resolve_enum_ty(src_ty) == _resolve_enum_ty(dst_ty):
-        return True
-    if src_ty == "none" and _is_ref_type(dst_ty):
-        return True
-    if dst_ty in _USER_INTERFACE_NAMES and src_ty in _CLASS_IMPLEMENTS:
-        if dst_ty in _CLASS_IMPLEMENTS[src_ty]:
-            return True
-    return False
-
-
-def _resolve_enum_ty(ty: str) -> str:
-    """Resolve enum type names to i64."""
-    if ty in _USER_ENUM_NAMES:
-        return "i64"
-    return ty
+# Work-stack markers for TypeChecker._check_body: leave a block scope / leave a loop body
+_END_SCOPE = object()
+_END_LOOP = object()
 
 
-def _is_known(t: str) -> bool:
-    if t in KNOWN_BASE_TYPES:
-        return True
-    if t in _USER_CLASS_NAMES:
-        return True
-    if t in _USER_STRUCT_NAMES:
-        return True
-    if t in _USER_INTERFACE_NAMES:
-        return True
-    if t in _USER_ENUM_NAMES:
-        return True
-    if is_list_type(t):
-        return _is_known(list_elem_type(t))
-    if is_dict_type(t):
-        return _is_known(dict_key_type(t)) and _is_known(dict_val_type(t))
-    if is_fn_type(t):
-        for pt in fn_param_types(t):
-            if not _is_known(pt):
-                return False
-        return _is_known(fn_ret_type(t))
-    if is_tuple_type(t):
-        return all(_is_known(et) for et in tuple_elem_types(t))
-    return False
-
-
-def _require_known(loc, t: str) -> None:
-    if not _is_known(t):
-        raise TypeError(loc, f"unknown type '{t}'")
+def _method_sig_set(methods: Dict[str, Tuple[Tuple[str, ...], str]]) -> FrozenSet[Tuple[str, Tuple[str, ...], str]]:
+    """{name: ((param types...), ret)} -> frozenset of (name, (param types...), ret)"""
+    return frozenset((mname, ptys, ret) for mname, (ptys, ret) in methods.items())
 
 
 def _set_expr_ty(e: Expr, ty: str) -> str:
-    setattr(e, "ty", ty)
+    e.ty = ty
     return ty
 
 
@@ -254,40 +259,43 @@ def expr_ty(e: Expr) -> str:
     return ty
 
 
-@dataclass
+@dataclass(slots=True)
 class VarInfo:
     ty: str
     is_const: bool = False
 
 
-@dataclass
+@dataclass(slots=True)
 class ClassInfo:
     name: str
     fields: Dict[str, str]           # field_name -> type_name
-    methods: Dict[str, Tuple[List[str], str]]  # method_name -> ([param types excl self], ret_type)
-    init_params: List[str]           # param types for constructor (excl self)
+    methods: Dict[str, Tuple[Tuple[str, ...], str]]  # method_name -> ((param types excl self), ret_type)
+    init_params: Tuple[str, ...]     # param types for constructor (excl self)
 
-@dataclass
+@dataclass(slots=True)
 class StructInfo:
     name: str
     fields: Dict[str, str]           # field_name -> type_name (ordered)
     field_order: List[str]           # field names in declaration order
-    methods: Dict[str, Tuple[List[str], str]]  # method_name -> ([param types excl self], ret_type)
+    methods: Dict[str, Tuple[Tuple[str, ...], str]]  # method_name -> ((param types excl self), ret_type)
 
-@dataclass
+@dataclass(slots=True)
 class InterfaceInfo:
     name: str
-    methods: Dict[str, Tuple[List[str], str]]  # method_name -> ([param types excl self], ret_type)
+    methods: Dict[str, Tuple[Tuple[str, ...], str]]  # method_name -> ((param types excl self), ret_type)
 
 
 class TypeChecker:
-    def __init__(self, prog: Program, quiet: bool = False):
-        self.prog = prog
-        self.quiet = quiet
-        self.funcs: Dict[str, Tuple[List[str], str]] = {}
-        self.vars: List[Dict[str, VarInfo]] = []
+    def __init__(self, prog: Program, quiet: bool = False) -> None:
+        self.prog: Program = prog
+        self.quiet: bool = quiet
+        self.funcs: Dict[str, Tuple[Tuple[str, ...], str]] = {}
+        # Variables: one flat name -> binding map; each open scope records the
+        # bindings it shadowed so _pop_scope can restore them
+        self.env: Dict[str, VarInfo] = {}
+        self.shadowed: List[Dict[str, Optional[VarInfo]]] = []
         self.cur_ret: Optional[str] = None
-        self.loop_depth = 0
+        self.loop_depth: int = 0
         self.classes: Dict[str, ClassInfo] = {}
         self.structs: Dict[str, StructInfo] = {}
         self.interfaces: Dict[str, InterfaceInfo] = {}
@@ -296,26 +304,46 @@ class TypeChecker:
         self.cur_struct: Optional[str] = None  # set when inside a struct method
         self.cur_type_params: List[str] = []   # type params in scope (for generic funcs)
         self.generic_funcs: Dict[str, FuncDecl] = {}  # name -> generic func template
-        self.generic_instantiations: Dict[str, Tuple[List[str], str]] = {}  # mangled_name -> (param_tys, ret_ty)
+        self.generic_instantiations: Dict[str, Tuple[Tuple[str, ...], str]] = {}  # mangled_name -> (param_tys, ret_ty)
+        # Registered user type names (filled by the registration passes in check())
+        self.class_names: Set[str] = set()
+        self.struct_names: Set[str] = set()
+        self.interface_names: Set[str] = set()
+        self.enum_names: Set[str] = set()
+        self._ty_class: Dict[str, int] = dict(_TY_CLASS)  # _TY_CLASS plus this program's enums
+        self.class_implements: Dict[str, Set[str]] = {}  # class name -> interface names it implements
+        self._impl_edges: Set[Tuple[str, str]] = set()  # (class, interface) pairs, flattened after pass 2
+        # Call names that never resolve to a plain user function or fn-pointer variable
+        self._reserved_call_names: FrozenSet[str] = frozenset()
+        # type name -> (kind, method table) for every interface/struct/class; built before bodies are checked
+        self._method_owners: Dict[str, Tuple[str, Dict[str, Tuple[Tuple[str, ...], str]]]] = {}
+        # Concrete generic instantiations registered but not yet checked. Checking
+        # one in the middle of its caller would clobber the caller's scope,
+        # cur_ret and loop_depth, so they are drained between bodies instead.
+        self._pending_insts: Deque[FuncDecl] = deque()
+        # (src, dst) -> _assignable result for pairs that are not simply equal
+        self._assign_cache: Dict[Tuple[str, str], bool] = {}
+        # generic func name -> where its type parameter is inferred from (see _infer_plan)
+        self._infer_plans: Dict[str, List[Tuple[int, str]]] = {}
+        # (generic func name, concrete type param) -> mangled instantiation name
+        self._generic_mangled: Dict[Tuple[str, str], str] = {}
+        # Built-in + user type names once all names are registered, plus every
+        # composite type _is_known has since verified (names are never removed)
+        self._known_tys: Set[str] = set(KNOWN_BASE_TYPES)
 
     def check(self) -> None:
-        _USER_CLASS_NAMES.clear()
-        _USER_STRUCT_NAMES.clear()
-        _USER_INTERFACE_NAMES.clear()
-        _USER_ENUM_NAMES.clear()
-        _CLASS_IMPLEMENTS.clear()
-
         # Pass 0: register all interface names
         for iface in self.prog.interfaces:
             if iface.name in KNOWN_BASE_TYPES:
                 raise TypeError(iface.loc, f"interface '{iface.name}' conflicts with built-in type")
-            _USER_INTERFACE_NAMES.add(iface.name)
+            self.interface_names.add(iface.name)
 
         # Pass 0b: register all enum names and resolve variant values
         for enum in self.prog.enums:
-            if enum.name in KNOWN_BASE_TYPES or enum.name in _USER_INTERFACE_NAMES:
+            if enum.name in KNOWN_BASE_TYPES or enum.name in self.interface_names:
                 raise TypeError(enum.loc, f"enum '{enum.name}' conflicts with existing type")
-            _USER_ENUM_NAMES.add(enum.name)
+            self.enum_names.add(enum.name)
+            self._ty_class[enum.name] = _TC_INT | _TC_ENUM
             variants: Dict[str, Tuple[str, int]] = {}
             next_val = 0
             for v in enum.variants:
@@ -332,61 +360,73 @@ class TypeChecker:
         for cls in self.prog.classes:
             if cls.name in KNOWN_BASE_TYPES:
                 raise TypeError(cls.loc, f"class '{cls.name}' conflicts with built-in type")
-            if cls.name in _USER_INTERFACE_NAMES:
+            if cls.name in self.interface_names:
                 raise TypeError(cls.loc, f"class '{cls.name}' conflicts with interface name")
-            _USER_CLASS_NAMES.add(cls.name)
+            self.class_names.add(cls.name)
 
         # Pass 1b: register all struct names
         for st in self.prog.structs:
-            if st.name in KNOWN_BASE_TYPES or st.name in _USER_CLASS_NAMES or st.name in _USER_INTERFACE_NAMES or st.name in _USER_ENUM_NAMES:
+            if st.name in KNOWN_BASE_TYPES or st.name in self.class_names or st.name in self.interface_names or st.name in self.enum_names:
                 raise TypeError(st.loc, f"struct '{st.name}' conflicts with existing type")
-            _USER_STRUCT_NAMES.add(st.name)
+            self.struct_names.add(st.name)
+
+        # Every type name is registered now -- leaf lookups in _is_known become one set probe
+        self._known_tys = set(
+            KNOWN_BASE_TYPES | self.class_names | self.struct_names | self.interface_names | self.enum_names
+        )
 
         # Validate and register interfaces
+        iface_sigs: Dict[str, FrozenSet[Tuple[str, Tuple[str, ...], str]]] = {}  # interface name -> its method signature set
         for iface in self.prog.interfaces:
-            methods: Dict[str, Tuple[List[str], str]] = {}
+            methods: Dict[str, Tuple[Tuple[str, ...], str]] = {}
             for ms in iface.method_sigs:
                 if not ms.params or ms.params[0].name != "self":
                     raise TypeError(ms.loc, f"interface method '{ms.name}' must have 'self' as first parameter")
                 param_tys: List[str] = []
                 for p in ms.params[1:]:
-                    _require_known(p.loc, p.ty.name)
-                    param_tys.append(p.ty.name)
-                _require_known(ms.loc, ms.ret.name)
-                methods[ms.name] = (param_tys, ms.ret.name)
+                    self._require_known(p.loc, p.ty.name)
+                    param_tys.append(_intern(p.ty.name))
+                self._require_known(ms.loc, ms.ret.name)
+                methods[ms.name] = (tuple(param_tys), _intern(ms.ret.name))
             self.interfaces[iface.name] = InterfaceInfo(name=iface.name, methods=methods)
+            iface_sigs[iface.name] = _method_sig_set(methods)
 
         # Pass 2: validate field/method types and build ClassInfo
         for cls in self.prog.classes:
             fields: Dict[str, str] = {}
             for fd in cls.fields:
-                _require_known(fd.loc, fd.ty.name)
-                fields[fd.name] = fd.ty.name
+                self._require_known(fd.loc, fd.ty.name)
+                fields[fd.name] = _intern(fd.ty.name)
 
-            methods: Dict[str, Tuple[List[str], str]] = {}
-            init_params: List[str] = []
+            methods: Dict[str, Tuple[Tuple[str, ...], str]] = {}
+            init_params: Tuple[str, ...] = ()
             for m in cls.methods:
                 # First param must be 'self'
                 if not m.params or m.params[0].name != "self":
                     raise TypeError(m.loc, f"class method '{m.name}' must have 'self' as first parameter")
                 param_tys: List[str] = []
                 for p in m.params[1:]:  # skip self
-                    _require_known(p.loc, p.ty.name)
-                    param_tys.append(p.ty.name)
-                _require_known(m.loc, m.ret.name)
-                methods[m.name] = (param_tys, m.ret.name)
+                    self._require_known(p.loc, p.ty.name)
+                    param_tys.append(_intern(p.ty.name))
+                self._require_known(m.loc, m.ret.name)
+                methods[m.name] = (tuple(param_tys), _intern(m.ret.name))
                 if m.name == "init":
-                    init_params = param_tys
+                    init_params = methods[m.name][0]
 
             self.classes[cls.name] = ClassInfo(
                 name=cls.name, fields=fields, methods=methods, init_params=init_params
             )
 
-            # Validate implements
-            impl_set: set = set()
+            # Validate implements: conforming iff the interface's signatures are a subset of the class's
+            impl_set: Set[str] = set()
+            cls_sigs = _method_sig_set(methods) if cls.implements else frozenset()
             for iname in cls.implements:
                 if iname not in self.interfaces:
                     raise TypeError(cls.loc, f"class '{cls.name}' implements unknown interface '{iname}'")
+                if iface_sigs[iname] <= cls_sigs:
+                    impl_set.add(iname)
+                    continue
+                # Not conforming -- find the first offending method for the diagnostic
                 ii = self.interfaces[iname]
                 for mname, (iface_ptys, iface_ret) in ii.methods.items():
                     if mname not in methods:
@@ -398,7 +438,8 @@ class TypeChecker:
                             f"({', '.join(cls_ptys)}) -> {cls_ret}, but interface '{iname}' "
                             f"requires ({', '.join(iface_ptys)}) -> {iface_ret}")
                 impl_set.add(iname)
-            _CLASS_IMPLEMENTS[cls.name] = impl_set
+            self.class_implements[cls.name] = impl_set
+        self._impl_edges = {(c, i) for c, ifaces in self.class_implements.items() for i in ifaces}
 
         # Detect circular class references (note, not error)
         self._check_circular_refs()
@@ -408,13 +449,13 @@ class TypeChecker:
             fields: Dict[str, str] = {}
             field_order: List[str] = []
             for fd in st.fields:
-                _require_known(fd.loc, fd.ty.name)
-                if _is_ref_type(fd.ty.name):
+                self._require_known(fd.loc, fd.ty.name)
+                if self._is_ref_type(fd.ty.name):
                     raise TypeError(fd.loc, f"struct field '{fd.name}' cannot have reference type '{fd.ty.name}' — only value types allowed")
-                fields[fd.name] = fd.ty.name
+                fields[fd.name] = _intern(fd.ty.name)
                 field_order.append(fd.name)
 
-            methods: Dict[str, Tuple[List[str], str]] = {}
+            methods: Dict[str, Tuple[Tuple[str, ...], str]] = {}
             for m in st.methods:
                 if m.name == "init":
                     raise TypeError(m.loc, f"structs cannot have 'init' methods — construction is positional by field order")
@@ -422,17 +463,17 @@ class TypeChecker:
                     raise TypeError(m.loc, f"struct method '{m.name}' must have 'self' as first parameter")
                 param_tys: List[str] = []
                 for p in m.params[1:]:
-                    _require_known(p.loc, p.ty.name)
-                    param_tys.append(p.ty.name)
-                _require_known(m.loc, m.ret.name)
-                methods[m.name] = (param_tys, m.ret.name)
+                    self._require_known(p.loc, p.ty.name)
+                    param_tys.append(_intern(p.ty.name))
+                self._require_known(m.loc, m.ret.name)
+                methods[m.name] = (tuple(param_tys), _intern(m.ret.name))
 
             self.structs[st.name] = StructInfo(
                 name=st.name, fields=fields, field_order=field_order, methods=methods
             )
 
         # Detect circular struct references (value types cannot contain themselves)
-        def _struct_cycle(start: str, visited: set) -> Optional[str]:
+        def _struct_cycle(start: str, visited: Set[str]) -> Optional[str]:
             for fname, fty in self.structs[start].fields.items():
                 if fty in self.structs:
                     if fty in visited:
@@ -454,38 +495,54 @@ class TypeChecker:
                 # Generic function template — store separately, don't check body yet
                 self.generic_funcs[f.name] = f
                 continue
-            _require_known(f.loc, f.ret.name)
+            self._require_known(f.loc, f.ret.name)
             param_tys: List[str] = []
             for p in f.params:
-                _require_known(p.loc, p.ty.name)
-                param_tys.append(p.ty.name)
+                self._require_known(p.loc, p.ty.name)
+                param_tys.append(_intern(p.ty.name))
             if f.name in self.funcs:
                 raise TypeError(f.loc, f"duplicate function '{f.name}'")
-            self.funcs[f.name] = (param_tys, f.ret.name)
+            self.funcs[f.name] = (tuple(param_tys), _intern(f.ret.name))
+
+        self._reserved_call_names = frozenset(
+            _BUILTIN_DISPATCH.keys() | self.classes.keys() | self.interfaces.keys() | self.generic_funcs.keys()
+        )
+
+        # One table for method-call resolution; the precedence (interface, then
+        # struct, then class) matches the order _check_call used to test them in
+        for kind, infos in (("class", self.classes), ("struct", self.structs), ("interface", self.interfaces)):
+            for tname, info in infos.items():
+                self._method_owners[tname] = (kind, info.methods)
+
+        # Instantiations are appended to prog.funcs as calls are checked; those
+        # are checked from the worklist, not by the loop below
+        plain_funcs = [f for f in self.prog.funcs if not f.type_params]
 
         # Typecheck top-level statements first (global scope)
         # This scope persists so functions/methods can access global variables.
         self._push_scope()
         self.cur_ret = None
         self.loop_depth = 0
-        for st in self.prog.stmts:
-            self._check_stmt(st)
+        self._check_body(self.prog.stmts)
+
+        self._check_pending_insts()
 
         # Typecheck non-generic functions (global scope is still on the stack)
-        for f in self.prog.funcs:
-            if f.type_params:
-                continue  # skip generic templates
+        for f in plain_funcs:
             self._check_func(f)
+            self._check_pending_insts()
 
         # Typecheck class methods
         for cls in self.prog.classes:
             for m in cls.methods:
                 self._check_method(cls.name, m)
+                self._check_pending_insts()
 
         # Typecheck struct methods
         for st in self.prog.structs:
             for m in st.methods:
                 self._check_struct_method(st.name, m)
+                self._check_pending_insts()
 
         self._pop_scope()
 
@@ -494,21 +551,108 @@ class TypeChecker:
     # -------------------------
 
     def _push_scope(self) -> None:
-        self.vars.append({})
+        self.shadowed.append({})
 
     def _pop_scope(self) -> None:
-        self.vars.pop()
+        env = self.env
+        for name, prev in self.shadowed.pop().items():
+            if prev is None:
+                del env[name]
+            else:
+                env[name] = prev
 
-    def _declare(self, name: str, ty: str, loc, is_const: bool = False) -> None:
-        if name in self.vars[-1]:
+    def _declare(self, name: str, ty: str, loc: SrcLoc, is_const: bool = False) -> None:
+        frame = self.shadowed[-1]
+        if name in frame:
             raise TypeError(loc, f"variable '{name}' already declared in this scope")
-        self.vars[-1][name] = VarInfo(ty=ty, is_const=is_const)
+        frame[name] = self.env.get(name)
+        self.env[name] = VarInfo(ty=_intern(ty), is_const=is_const)
+
+    def _try_lookup(self, name: str) -> Optional[VarInfo]:
+        """Like _lookup, but returns None for an undefined name instead of raising."""
+        return self.env.get(name)
+
+    def _lookup(self, name: str, loc: SrcLoc) -> VarInfo:
+        vi = self.env.get(name)
+        if vi is None:
+            raise TypeError(loc, f"undefined variable '{name}'")
+        return vi
+
+    # -------------------------
+    # Type predicates
+    # -------------------------
+
+    def _is_ref_type(self, t: str) -> bool:
+        if t == "str":
+            return True
+        if is_list_type(t) or is_dict_type(t):
+            return True
+        if t in self.class_names:
+            return True
+        if t in self.interface_names:
+            return True
+        return False
+
+    def _is_truthy_type(self, t: str) -> bool:
+        """Returns True if this type can be used in boolean contexts (if, while, not, and, or).
+        Truthy types: bool, all integers, all ref types (None is falsy)."""
+        if self._ty_class.get(t, 0) & (_TC_BOOL | _TC_INT):
+            return True
+        if self._is_ref_type(t):
+            return True
+        return False
+
+    # none is assignable to any reference type
+    # class is assignable to any interface it implements
+    def _assignable(self, src_ty: str, dst_ty: str) -> bool:
+        # Identical types are by far the common case (and usually the same interned object)
+        if src_ty is dst_ty or src_ty == dst_ty:
+            return True
+        # The remaining rules depend only on the registered types, which are fixed
+        # once bodies are checked, so each distinct pair is resolved once
+        key = (src_ty, dst_ty)
+        ok = self._assign_cache.get(key)
+        if ok is None:
+            ok = self._assign_cache[key] = self._assignable_slow(src_ty, dst_ty)
+        return ok
+
+    def _assignable_slow(self, src_ty: str, dst_ty: str) -> bool:
+        # Enum types are interchangeable with i64 -- only worth resolving if an enum is involved
+        enum_names = self.enum_names
+        if (src_ty in enum_names or dst_ty in enum_names) and \
+                self._resolve_enum_ty(src_ty) == self._resolve_enum_ty(dst_ty):
+            return True
+        if src_ty == "none" and self._is_ref_type(dst_ty):
+            return True
+        return (src_ty, dst_ty) in self._impl_edges
+
+    def _resolve_enum_ty(self, ty: str) -> str:
+        """Resolve enum type names to i64."""
+        if ty in self.enum_names:
+            return "i64"
+        return ty
 
-    def _lookup(self, name: str, loc) -> VarInfo:
-        for scope in reversed(self.vars):
-            if name in scope:
-                return scope[name]
-        raise TypeError(loc, f"undefined variable '{name}'")
+    def _is_known(self, t: str) -> bool:
+        # Hot callers test `t in self._known_tys` inline and only call this on a miss
+        if t in self._known_tys:
+            return True
+        if is_list_type(t):
+            known = self._is_known(list_elem_type(t))
+        elif is_dict_type(t):
+            known = self._is_known(dict_key_type(t)) and self._is_known(dict_val_type(t))
+        elif is_fn_type(t):
+            known = all(self._is_known(pt) for pt in fn_param_types(t)) and self._is_known(fn_ret_type(t))
+        elif is_tuple_type(t):
+            known = all(self._is_known(et) for et in tuple_elem_types(t))
+        else:
+            return False
+        if known:
+            self._known_tys.add(t)
+        return known
+
+    def _require_known(self, loc: SrcLoc, t: str) -> None:
+        if t not in self._known_tys and not self._is_known(t):
+            raise TypeError(loc, f"unknown type '{t}'")
 
     # -------------------------
     # Circular reference detection
@@ -519,26 +663,32 @@ class TypeChecker:
         Self-references (e.g. Node.next: Node) are allowed silently.
         Multi-class cycles (A -> B -> A) emit a note."""
 
-        def _extract_class_refs(ty: str) -> set:
+        refs_cache: Dict[str, FrozenSet[str]] = {}  # type name -> class names reachable from it
+
+        def _extract_class_refs(ty: str) -> FrozenSet[str]:
             """Extract all class names reachable from a type (including through containers)."""
-            refs: set = set()
+            refs = refs_cache.get(ty)
+            if refs is not None:
+                return refs
             if ty in self.classes:
-                refs.add(ty)
+                refs = frozenset((ty,))
             elif is_list_type(ty):
-                refs |= _extract_class_refs(list_elem_type(ty))
+                refs = _extract_class_refs(list_elem_type(ty))
             elif is_dict_type(ty):
-                refs |= _extract_class_refs(dict_key_type(ty))
-                refs |= _extract_class_refs(dict_val_type(ty))
+                refs = _extract_class_refs(dict_key_type(ty)) | _extract_class_refs(dict_val_type(ty))
+            else:
+                refs = frozenset()
+            refs_cache[ty] = refs
             return refs
 
         # Build adjacency: class -> set of class names referenced by fields
         # Self-edges are excluded -- a class may reference itself (linked lists, trees)
-        adj: Dict[str, set] = {name: set() for name in self.classes}
-        field_locs: Dict[str, dict] = {}  # cls_name -> {target_name: loc}
-        field_names: Dict[str, dict] = {}  # cls_name -> {target_name: field_name}
+        adj: Dict[str, Set[str]] = {name: set() for name in self.classes}
+        field_locs: Dict[str, Dict[str, SrcLoc]] = {}  # cls_name -> {target_name: loc}
+        field_names: Dict[str, Dict[str, str]] = {}  # cls_name -> {target_name: field_name}
         for cls in self.prog.classes:
-            locs: dict = {}
-            names: dict = {}
+            locs: Dict[str, SrcLoc] = {}
+            names: Dict[str, str] = {}
             for fd in cls.fields:
                 for target in _extract_class_refs(fd.ty.name):
                     if target == cls.name:
@@ -554,15 +704,15 @@ class TypeChecker:
         color: Dict[str, int] = {n: WHITE for n in adj}
         parent: Dict[str, Optional[str]] = {n: None for n in adj}
 
-        def dfs(u: str) -> Optional[list]:
+        def dfs(u: str) -> Optional[List[str]]:
             color[u] = GRAY
             for v in adj[u]:
                 if v not in color:
                     continue
                 if color[v] == GRAY:
                     cycle = [v, u]
-                    cur = u
-                    while cur != v:
+                    cur: Optional[str] = u
+                    while cur is not None and cur != v:
                         cur = parent[cur]
                         if cur is None:
                             break
@@ -598,23 +748,28 @@ class TypeChecker:
     # Functions / statements
     # -------------------------
 
+    def _check_pending_insts(self) -> None:
+        """Check queued generic instantiations (which may queue further ones)."""
+        pending = self._pending_insts
+        while pending:
+            self._check_func(pending.popleft())
+
     def _check_func(self, f: FuncDecl) -> None:
         self._push_scope()
-        self.cur_ret = f.ret.name
+        self.cur_ret = _intern(f.ret.name)
         self.loop_depth = 0
 
         # params are declared
         for p in f.params:
             self._declare(p.name, p.ty.name, p.loc)
 
-        for st in f.body.stmts:
-            self._check_stmt(st)
+        self._check_body(f.body.stmts)
 
         self._pop_scope()
 
     def _check_method(self, class_name: str, m: FuncDecl) -> None:
         self._push_scope()
-        self.cur_ret = m.ret.name
+        self.cur_ret = _intern(m.ret.name)
         self.cur_class = class_name
         self.loop_depth = 0
 
@@ -623,15 +778,14 @@ class TypeChecker:
         for p in m.params[1:]:
             self._declare(p.name, p.ty.name, p.loc)
 
-        for st in m.body.stmts:
-            self._check_stmt(st)
+        self._check_body(m.body.stmts)
 
         self.cur_class = None
         self._pop_scope()
 
     def _check_struct_method(self, struct_name: str, m: FuncDecl) -> None:
         self._push_scope()
-        self.cur_ret = m.ret.name
+        self.cur_ret = _intern(m.ret.name)
         self.cur_struct = struct_name
         self.loop_depth = 0
 
@@ -640,683 +794,510 @@ class TypeChecker:
         for p in m.params[1:]:
             self._declare(p.name, p.ty.name, p.loc)
 
-        for st in m.body.stmts:
-            self._check_stmt(st)
+        self._check_body(m.body.stmts)
 
         self.cur_struct = None
         self._pop_scope()
 
-    def _check_stmt(self, st: Stmt) -> None:
-        if isinstance(st, SVarDecl):
-            # Pass declared type as hint so literals adapt
-            hint = st.ty.name if st.ty else None
-            val_ty = self._check_expr(st.value, target_ty=hint)
-            if st.ty is None:
-                # := shorthand — infer type from RHS
-                if val_ty == "none":
-                    raise TypeError(st.loc, "cannot infer type from 'None' in := declaration")
-                if val_ty == "void":
-                    raise TypeError(st.loc, "cannot infer type from void expression in := declaration")
-                st.ty = TypeRef(st.loc, val_ty)
+    def _check_body(self, stmts: List[Stmt]) -> None:
+        """Check a statement list. Nested blocks (while/for/if/block) are walked
+        with an explicit work stack rather than recursion; leaving a block is
+        queued as an _END_SCOPE / _END_LOOP marker behind its statements."""
+        # Holds statements, if-arms and the scope/loop markers
+        stack: List[Any] = list(reversed(stmts))
+        # Hot loop: bind the per-iteration callables once; dispatch on exact type()
+        pop = stack.pop
+        push = stack.append
+        extend = stack.extend
+        check_stmt = self._check_stmt
+        while stack:
+            st = pop()
+            t = type(st)
+            if st is _END_SCOPE:
+                self._pop_scope()
+            elif st is _END_LOOP:
+                self._pop_scope()
+                self.loop_depth -= 1
+            elif t is SWhile:
+                cty = self._check_expr(st.cond)
+                if not self._is_truthy_type(cty):
+                    raise TypeError(st.loc, f"while condition must be bool, integer, or reference type, got {cty}")
+                self.loop_depth += 1
+                self._push_scope()
+                push(_END_LOOP)
+                extend(reversed(st.body.stmts))
+            elif t is SFor:
+                if st.var_ty.name not in self._known_tys:
+                    self._require_known(st.loc, st.var_ty.name)
+                iter_ty = self._check_expr(st.iterable)
+                kind, parts = _type_shape(iter_ty) or ("", ())
+                if kind != "list":
+                    raise TypeError(st.loc, f"for-in requires a list type, got {iter_ty}")
+                elem_ty = parts[0]
+                if st.var_ty.name != elem_ty:
+                    raise TypeError(st.loc, f"loop variable type '{st.var_ty.name}' does not match list element type '{elem_ty}'")
+                self.loop_depth += 1
+                self._push_scope()
+                self._declare(st.var_name, elem_ty, st.loc)
+                push(_END_LOOP)
+                extend(reversed(st.body.stmts))
+            elif t is SIf:
+                # Arms are checked in order, each in its own scope
+                extend(reversed(st.arms))
+            elif t is IfArm:
+                if st.cond is not None:
+                    cty = self._check_expr(st.cond)
+                    if not self._is_truthy_type(cty):
+                        raise TypeError(st.loc, f"if/elif condition must be bool, integer, or reference type, got {cty}")
+                self._push_scope()
+                push(_END_SCOPE)
+                extend(reversed(st.block.stmts))
+            elif t is SBlock:
+                self._push_scope()
+                push(_END_SCOPE)
+                extend(reversed(st.stmts))
             else:
-                _require_known(st.loc, st.ty.name)
-                if not _assignable(val_ty, st.ty.name):
-                    raise TypeError(st.loc, f"cannot assign value of type {val_ty} to variable '{st.name}' of type {st.ty.name}")
-            if st.is_static and self.cur_ret is None:
-                raise TypeError(st.loc, "'static' variables are only allowed inside functions")
-            self._declare(st.name, st.ty.name, st.loc, is_const=st.is_const)
+                check_stmt(st)
+
+    def _check_assign_op(self, loc: SrcLoc, op: str, ty: str, rhs_ty: str, target: str, is_field: bool = False) -> None:
+        """Validate `target op rhs` where target (a variable or field name) has
+        type ty (shared by variable and field assignment)."""
+        cat = _OP_CATEGORY.get(op)
+        if cat is None:
+            raise TypeError(loc, f"unknown assignment operator '{op}'")
+        if cat == _OP_PLAIN:
+            if rhs_ty is not ty and not self._assignable(rhs_ty, ty):
+                what = f"field '{target}'" if is_field else f"'{target}'"
+                raise TypeError(loc, f"cannot assign {rhs_ty} to {what} of type {ty}")
             return
-
-        if isinstance(st, SAssign):
-            vi = self._lookup(st.name, st.loc)
-            if vi.is_const:
-                raise TypeError(st.loc, f"cannot assign to constant '{st.name}'")
-            rhs_ty = self._check_expr(st.value, target_ty=vi.ty)
-
-            if st.op == "=":
-                if not _assignable(rhs_ty, vi.ty):
-                    raise TypeError(st.loc, f"cannot assign {rhs_ty} to '{st.name}' of type {vi.ty}")
-                return
-
-            # compound assigns numeric only, and rhs must match var type
-            if st.op in {"+=", "-=", "*=", "/=", "%="}:
-                # str += str is allowed (concatenation)
-                if st.op == "+=" and vi.ty == "str":
-                    if rhs_ty != "str":
-                        raise TypeError(st.loc, f"cannot apply '{st.op}' with str and {rhs_ty}")
-                    return
-                if vi.ty not in NUM_TYPES:
-                    raise TypeError(st.loc, f"compound assignment '{st.op}' only allowed on numeric types, got {vi.ty}")
-                if rhs_ty != vi.ty:
-                    raise TypeError(st.loc, f"cannot apply '{st.op}' with {vi.ty} and {rhs_ty}")
-                return
-
-            if st.op in {"&=", "|=", "^=", "<<=", ">>="}:
-                if vi.ty not in INT_TYPES:
-                    raise TypeError(st.loc, f"compound assignment '{st.op}' only allowed on integer types, got {vi.ty}")
-                if rhs_ty != vi.ty:
-                    raise TypeError(st.loc, f"cannot apply '{st.op}' with {vi.ty} and {rhs_ty}")
+        on_field = " on field" if is_field else ""
+        if cat == _OP_NUM:
+            # str += str is allowed (concatenation) on variables
+            if op == "+=" and ty == "str" and not is_field:
+                if rhs_ty != "str":
+                    raise TypeError(loc, f"cannot apply '{op}' with str and {rhs_ty}")
                 return
+            if ty not in NUM_TYPES:
+                raise TypeError(loc, f"compound assignment '{op}'{on_field} only allowed on numeric types, got {ty}")
+        elif ty not in INT_TYPES:
+            raise TypeError(loc, f"compound assignment '{op}'{on_field} only allowed on integer types, got {ty}")
+        # compound assigns require the rhs to match the target type exactly
+        if rhs_ty != ty:
+            raise TypeError(loc, f"cannot apply '{op}' with {ty} and {rhs_ty}")
 
-            raise TypeError(st.loc, f"unknown assignment operator '{st.op}'")
-
-        if isinstance(st, SMemberAssign):
-            obj_ty = self._check_expr(st.obj)
-            if obj_ty in self.interfaces:
-                raise TypeError(st.loc, f"cannot assign fields on interface type '{obj_ty}'")
-            if obj_ty in self.structs:
-                si = self.structs[obj_ty]
-                if st.member not in si.fields:
-                    raise TypeError(st.loc, f"struct '{obj_ty}' has no field '{st.member}'")
-                field_ty = si.fields[st.member]
-                rhs_ty = self._check_expr(st.value, target_ty=field_ty)
-                if st.op == "=":
-                    if not _assignable(rhs_ty, field_ty):
-                        raise TypeError(st.loc, f"cannot assign {rhs_ty} to field '{st.member}' of type {field_ty}")
-                    return
-                if st.op in {"+=", "-=", "*=", "/=", "%="}:
-                    if field_ty not in NUM_TYPES:
-                        raise TypeError(st.loc, f"compound assignment '{st.op}' on field only allowed on numeric types, got {field_ty}")
-                    if rhs_ty != field_ty:
-                        raise TypeError(st.loc, f"cannot apply '{st.op}' with {field_ty} and {rhs_ty}")
-                    return
-                if st.op in {"&=", "|=", "^=", "<<=", ">>="}:
-                    if field_ty not in INT_TYPES:
-                        raise TypeError(st.loc, f"compound assignment '{st.op}' on field only allowed on integer types, got {field_ty}")
-                    if rhs_ty != field_ty:
-                        raise TypeError(st.loc, f"cannot apply '{st.op}' with {field_ty} and {rhs_ty}")
-                    return
-                raise TypeError(st.loc, f"unknown assignment operator '{st.op}'")
+    def _check_stmt(self, st: Stmt) -> None:
+        handler = _STMT_HANDLERS.get(type(st))
+        if handler is None:
+            raise TypeError(st.loc, f"unhandled statement {type(st).__name__}")
+        handler(self, st)
+
+    def _check_var_decl(self, st: SVarDecl) -> None:
+        # Pass declared type as hint so literals adapt
+        hint = st.ty.name if st.ty else None
+        val_ty = self._check_expr(st.value, target_ty=hint)
+        if st.ty is None:
+            # := shorthand — infer type from RHS
+            if val_ty == "none":
+                raise TypeError(st.loc, "cannot infer type from 'None' in := declaration")
+            if val_ty == "void":
+                raise TypeError(st.loc, "cannot infer type from void expression in := declaration")
+            st.ty = TypeRef(st.loc, _intern(val_ty))
+        else:
+            if st.ty.name not in self._known_tys:
+                self._require_known(st.loc, st.ty.name)
+            if val_ty is not st.ty.name and not self._assignable(val_ty, st.ty.name):
+                raise TypeError(st.loc, f"cannot assign value of type {val_ty} to variable '{st.name}' of type {st.ty.name}")
+        if st.is_static and self.cur_ret is None:
+            raise TypeError(st.loc, "'static' variables are only allowed inside functions")
+        self._declare(st.name, st.ty.name, st.loc, is_const=st.is_const)
+
+    def _check_assign(self, st: SAssign) -> None:
+        vi = self._lookup(st.name, st.loc)
+        if vi.is_const:
+            raise TypeError(st.loc, f"cannot assign to constant '{st.name}'")
+        rhs_ty = self._check_expr(st.value, target_ty=vi.ty)
+        self._check_assign_op(st.loc, st.op, vi.ty, rhs_ty, st.name)
+
+    def _check_member_assign(self, st: SMemberAssign) -> None:
+        obj_ty = self._check_expr(st.obj)
+        if obj_ty in self.interfaces:
+            raise TypeError(st.loc, f"cannot assign fields on interface type '{obj_ty}'")
+        if obj_ty in self.structs:
+            si = self.structs[obj_ty]
+            if st.member not in si.fields:
+                raise TypeError(st.loc, f"struct '{obj_ty}' has no field '{st.member}'")
+            field_ty = si.fields[st.member]
+        else:
             if obj_ty not in self.classes:
                 raise TypeError(st.loc, f"member assignment on non-class type '{obj_ty}'")
             ci = self.classes[obj_ty]
             if st.member not in ci.fields:
                 raise TypeError(st.loc, f"class '{obj_ty}' has no field '{st.member}'")
             field_ty = ci.fields[st.member]
-            rhs_ty = self._check_expr(st.value, target_ty=field_ty)
-            if st.op == "=":
-                if not _assignable(rhs_ty, field_ty):
-                    raise TypeError(st.loc, f"cannot assign {rhs_ty} to field '{st.member}' of type {field_ty}")
-                return
-            if st.op in {"+=", "-=", "*=", "/=", "%="}:
-                if field_ty not in NUM_TYPES:
-                    raise TypeError(st.loc, f"compound assignment '{st.op}' on field only allowed on numeric types, got {field_ty}")
-                if rhs_ty != field_ty:
-                    raise TypeError(st.loc, f"cannot apply '{st.op}' with {field_ty} and {rhs_ty}")
-                return
-            if st.op in {"&=", "|=", "^=", "<<=", ">>="}:
-                if field_ty not in INT_TYPES:
-                    raise TypeError(st.loc, f"compound assignment '{st.op}' on field only allowed on integer types, got {field_ty}")
-                if rhs_ty != field_ty:
-                    raise TypeError(st.loc, f"cannot apply '{st.op}' with {field_ty} and {rhs_ty}")
-                return
-            raise TypeError(st.loc, f"unknown assignment operator '{st.op}'")
-
-        if isinstance(st, SIndexAssign):
-            obj_ty = self._check_expr(st.obj)
-            idx_ty = self._check_expr(st.index)
-            if is_list_type(obj_ty):
-                if idx_ty != "i64":
-                    raise TypeError(st.loc, f"list index must be i64, got {idx_ty}")
-                elem = list_elem_type(obj_ty)
-                rhs_ty = self._check_expr(st.value, target_ty=elem)
-                if st.op != "=":
-                    raise TypeError(st.loc, f"only '=' assignment supported for list subscript")
-                if not _assignable(rhs_ty, elem):
-                    raise TypeError(st.loc, f"cannot assign {rhs_ty} to list element of type {elem}")
-                return
-            if is_dict_type(obj_ty):
-                key = dict_key_type(obj_ty)
-                if idx_ty != key:
-                    raise TypeError(st.loc, f"dict key must be {key}, got {idx_ty}")
-                val = dict_val_type(obj_ty)
-                rhs_ty = self._check_expr(st.value, target_ty=val)
-                if st.op != "=":
-                    raise TypeError(st.loc, f"only '=' assignment supported for dict subscript")
-                if not _assignable(rhs_ty, val):
-                    raise TypeError(st.loc, f"cannot assign {rhs_ty} to dict value of type {val}")
-                return
-            rhs_ty = self._check_expr(st.value)
-            raise TypeError(st.loc, f"type '{obj_ty}' does not support subscript assignment []")
-
-        if isinstance(st, SExpr):
-            self._check_expr(st.expr)
-            return
-
-        if isinstance(st, SReturn):
-            if self.cur_ret is None:
-                raise TypeError(st.loc, "return not allowed at top level")
-            if st.value is None:
-                # bare return only allowed in void functions
-                if self.cur_ret != "void":
-                    raise TypeError(st.loc, f"return requires a value of type {self.cur_ret}")
-                return
-            if self.cur_ret == "void":
-                raise TypeError(st.loc, "void function must not return a value")
-            vty = self._check_expr(st.value, target_ty=self.cur_ret)
-            if not _assignable(vty, self.cur_ret):
-                raise TypeError(st.loc, f"return type mismatch: expected {self.cur_ret}, got {vty}")
-            return
-
-        if isinstance(st, SBreak):
-            if self.loop_depth <= 0:
-                raise TypeError(st.loc, "break not inside loop")
+        rhs_ty = self._check_expr(st.value, target_ty=field_ty)
+        self._check_assign_op(st.loc, st.op, field_ty, rhs_ty, st.member, is_field=True)
+
+    def _check_index_assign(self, st: SIndexAssign) -> None:
+        obj_ty = self._check_expr(st.obj)
+        idx_ty = self._check_expr(st.index)
+        kind, parts = _type_shape(obj_ty) or ("", ())
+        if kind == "list":
+            if idx_ty != "i64":
+                raise TypeError(st.loc, f"list index must be i64, got {idx_ty}")
+            elem = parts[0]
+            rhs_ty = self._check_expr(st.value, target_ty=elem)
+            if st.op != "=":
+                raise TypeError(st.loc, f"only '=' assignment supported for list subscript")
+            if rhs_ty is not elem and not self._assignable(rhs_ty, elem):
+                raise TypeError(st.loc, f"cannot assign {rhs_ty} to list element of type {elem}")
             return
-
-        if isinstance(st, SContinue):
-            if self.loop_depth <= 0:
-                raise TypeError(st.loc, "continue not inside loop")
-            return
-
-        if isinstance(st, SWhile):
-            cty = self._check_expr(st.cond)
-            if not _is_truthy_type(cty):
-                raise TypeError(st.loc, f"while condition must be bool, integer, or reference type, got {cty}")
-            self.loop_depth += 1
-            self._push_scope()
-            for s2 in st.body.stmts:
-                self._check_stmt(s2)
-            self._pop_scope()
-            self.loop_depth -= 1
-            return
-
-        if isinstance(st, SFor):
-            _require_known(st.loc, st.var_ty.name)
-            iter_ty = self._check_expr(st.iterable)
-            if not is_list_type(iter_ty):
-                raise TypeError(st.loc, f"for-in requires a list type, got {iter_ty}")
-            elem_ty = list_elem_type(iter_ty)
-            if st.var_ty.name != elem_ty:
-                raise TypeError(st.loc, f"loop variable type '{st.var_ty.name}' does not match list element type '{elem_ty}'")
-            self.loop_depth += 1
-            self._push_scope()
-            self._declare(st.var_name, elem_ty, st.loc)
-            for s2 in st.body.stmts:
-                self._check_stmt(s2)
-            self._pop_scope()
-            self.loop_depth -= 1
-            return
-
-        if isinstance(st, SIf):
-            for arm in st.arms:
-                if arm.cond is not None:
-                    cty = self._check_expr(arm.cond)
-                    if not _is_truthy_type(cty):
-                        raise TypeError(arm.loc, f"if/elif condition must be bool, integer, or reference type, got {cty}")
-                self._push_scope()
-                for s2 in arm.block.stmts:
-                    self._check_stmt(s2)
-                self._pop_scope()
+        if kind == "dict":
+            key, val = parts
+            if idx_ty != key:
+                raise TypeError(st.loc, f"dict key must be {key}, got {idx_ty}")
+            rhs_ty = self._check_expr(st.value, target_ty=val)
+            if st.op != "=":
+                raise TypeError(st.loc, f"only '=' assignment supported for dict subscript")
+            if rhs_ty is not val and not self._assignable(rhs_ty, val):
+                raise TypeError(st.loc, f"cannot assign {rhs_ty} to dict value of type {val}")
             return
-
-        if isinstance(st, SBlock):
-            self._push_scope()
-            for s2 in st.stmts:
-                self._check_stmt(s2)
-            self._pop_scope()
+        rhs_ty = self._check_expr(st.value)
+        raise TypeError(st.loc, f"type '{obj_ty}' does not support subscript assignment []")
+
+    def _check_expr_stmt(self, st: SExpr) -> None:
+        self._check_expr(st.expr)
+
+    def _check_return(self, st: SReturn) -> None:
+        if self.cur_ret is None:
+            raise TypeError(st.loc, "return not allowed at top level")
+        if st.value is None:
+            # bare return only allowed in void functions
+            if self.cur_ret != "void":
+                raise TypeError(st.loc, f"return requires a value of type {self.cur_ret}")
             return
-
-        if isinstance(st, STupleDestructure):
-            val_ty = self._check_expr(st.value)
-            if not is_tuple_type(val_ty):
-                raise TypeError(st.loc, f"cannot destructure non-tuple type '{val_ty}'")
-            elem_tys = tuple_elem_types(val_ty)
-            if len(elem_tys) != len(st.names):
-                raise TypeError(st.loc, f"tuple has {len(elem_tys)} elements, but {len(st.names)} names given")
-            for name, ety in zip(st.names, elem_tys):
-                self._declare(name, ety, st.loc)
-            return
-
-        raise TypeError(st.loc, f"unhandled statement {type(st).__name__}")
+        if self.cur_ret == "void":
+            raise TypeError(st.loc, "void function must not return a value")
+        vty = self._check_expr(st.value, target_ty=self.cur_ret)
+        if vty is not self.cur_ret and not self._assignable(vty, self.cur_ret):
+            raise TypeError(st.loc, f"return type mismatch: expected {self.cur_ret}, got {vty}")
+
+    def _check_break(self, st: SBreak) -> None:
+        if self.loop_depth <= 0:
+            raise TypeError(st.loc, "break not inside loop")
+
+    def _check_continue(self, st: SContinue) -> None:
+        if self.loop_depth <= 0:
+            raise TypeError(st.loc, "continue not inside loop")
+
+    def _check_tuple_destructure(self, st: STupleDestructure) -> None:
+        val_ty = self._check_expr(st.value)
+        if not is_tuple_type(val_ty):
+            raise TypeError(st.loc, f"cannot destructure non-tuple type '{val_ty}'")
+        elem_tys = tuple_elem_types(val_ty)
+        if len(elem_tys) != len(st.names):
+            raise TypeError(st.loc, f"tuple has {len(elem_tys)} elements, but {len(st.names)} names given")
+        for name, ety in zip(st.names, elem_tys):
+            self._declare(name, ety, st.loc)
 
     # -------------------------
     # Expressions
     # -------------------------
 
     def _check_expr(self, e: Expr, target_ty: Optional[str] = None) -> str:
-        if isinstance(e, EInt):
-            if target_ty in INT_TYPES:
-                return _set_expr_ty(e, target_ty)
-            return _set_expr_ty(e, "i64")
-
-        if isinstance(e, EFloat):
-            if target_ty in FLOAT_TYPES:
-                return _set_expr_ty(e, target_ty)
-            return _set_expr_ty(e, "f64")
-
-        if isinstance(e, EBool):
+        t = type(e)
+        # Literal leaves are the most common nodes; type them inline rather than
+        # paying for a handler call. Int/char/float literals adopt a matching hint.
+        if t is EInt or t is EChar:
+            ty = target_ty if target_ty in INT_TYPES else "i64"
+        elif t is EString:
+            ty = "str"
+        elif t is EBool:
+            ty = "bool"
+        elif t is EFloat:
+            ty = target_ty if target_ty in FLOAT_TYPES else "f64"
+        elif t is ENone:
+            ty = "none"
+        else:
+            handler = _EXPR_HANDLERS.get(t)
+            if handler is None:
+                raise TypeError(e.loc, f"unhandled expression {t.__name__}")
+            return handler(self, e, target_ty)
+        e.ty = ty
+        return ty
+
+    def _check_var(self, e: EVar, target_ty: Optional[str] = None) -> str:
+        # Function name used as a value (function pointer)
+        if target_ty and is_fn_type(target_ty) and e.name in self.funcs:
+            param_tys, ret_ty = self.funcs[e.name]
+            fn_ty = _fn_ty(param_tys, ret_ty)
+            if fn_ty != target_ty:
+                raise TypeError(e.loc, f"function '{e.name}' has type {fn_ty}, expected {target_ty}")
+            return _set_expr_ty(e, fn_ty)
+        vi = self._lookup(e.name, e.loc)
+        return _set_expr_ty(e, vi.ty)
+
+    def _check_unary(self, e: EUnary, target_ty: Optional[str] = None) -> str:
+        rhs_ty = self._check_expr(e.rhs, target_ty=target_ty)
+        if e.op == "-":
+            if not self._ty_class.get(rhs_ty, 0) & _TC_NUM:
+                raise TypeError(e.loc, f"unary '-' requires numeric, got {rhs_ty}")
+            return _set_expr_ty(e, rhs_ty)
+        if e.op == "not":
+            if not self._is_truthy_type(rhs_ty):
+                raise TypeError(e.loc, f"'not' requires bool, integer, or reference type, got {rhs_ty}")
             return _set_expr_ty(e, "bool")
-
-        if isinstance(e, EString):
-            return _set_expr_ty(e, "str")
-
-        if isinstance(e, EChar):
-            if target_ty in INT_TYPES:
-                return _set_expr_ty(e, target_ty)
-            return _set_expr_ty(e, "i64")
-
-        if isinstance(e, ENone):
-            return _set_expr_ty(e, "none")
-
-        if isinstance(e, EVar):
-            # Function name used as a value (function pointer)
-            if target_ty and is_fn_type(target_ty) and e.name in self.funcs:
-                param_tys, ret_ty = self.funcs[e.name]
-                fn_ty = f"Fn({','.join(param_tys)})->{ret_ty}"
-                if fn_ty != target_ty:
-                    raise TypeError(e.loc, f"function '{e.name}' has type {fn_ty}, expected {target_ty}")
-                return _set_expr_ty(e, fn_ty)
-            vi = self._lookup(e.name, e.loc)
-            return _set_expr_ty(e, vi.ty)
-
-        if isinstance(e, EUnary):
-            rhs_ty = self._check_expr(e.rhs, target_ty=target_ty)
-            if e.op == "-":
-                if _resolve_enum_ty(rhs_ty) not in NUM_TYPES:
-                    raise TypeError(e.loc, f"unary '-' requires numeric, got {rhs_ty}")
-                return _set_expr_ty(e, rhs_ty)
-            if e.op == "not":
-                if not _is_truthy_type(rhs_ty):
-                    raise TypeError(e.loc, f"'not' requires bool, integer, or reference type, got {rhs_ty}")
-                return _set_expr_ty(e, "bool")
-            if e.op == "~":
-                if _resolve_enum_ty(rhs_ty) not in INT_TYPES:
-                    raise TypeError(e.loc, f"unary '~' requires integer, got {rhs_ty}")
-                return _set_expr_ty(e, rhs_ty)
-            raise TypeError(e.loc, f"unknown unary operator '{e.op}'")
-
-        if isinstance(e, EIs):
-            lhs_ty = self._check_expr(e.expr)
-            rhs = e.type_name
-            # RHS must be a known type
-            if rhs == "None":
-                # 'x is None' — syntactic sugar for None check
-                return _set_expr_ty(e, "bool")
-            if not _is_known(rhs):
-                raise TypeError(e.loc, f"'is' right-hand side must be a type name, got '{rhs}'")
-            # Store the LHS type for codegen
-            setattr(e, "lhs_ty", lhs_ty)
+        if e.op == "~":
+            if not self._ty_class.get(rhs_ty, 0) & _TC_INT:
+                raise TypeError(e.loc, f"unary '~' requires integer, got {rhs_ty}")
+            return _set_expr_ty(e, rhs_ty)
+        raise TypeError(e.loc, f"unknown unary operator '{e.op}'")
+
+    def _check_is(self, e: EIs, target_ty: Optional[str] = None) -> str:
+        lhs_ty = self._check_expr(e.expr)
+        rhs = e.type_name
+        # RHS must be a known type
+        if rhs == "None":
+            # 'x is None' — syntactic sugar for None check
             return _set_expr_ty(e, "bool")
-
-        if isinstance(e, EAs):
-            lhs_ty = self._check_expr(e.expr)
-            target = e.type_name
-            if not _is_known(target):
-                raise TypeError(e.loc, f"'as' target must be a type name, got '{target}'")
-            # LHS must be an interface type
-            if lhs_ty not in self.interfaces:
-                raise TypeError(e.loc, f"'as' requires an interface type on the left, got '{lhs_ty}'")
-            # Target must be a class that implements the interface
-            if target not in self.classes:
-                raise TypeError(e.loc, f"'as' target must be a class type, got '{target}'")
-            if target not in _CLASS_IMPLEMENTS or lhs_ty not in _CLASS_IMPLEMENTS[target]:
-                raise TypeError(e.loc, f"class '{target}' does not implement interface '{lhs_ty}'")
-            # Store the LHS type for codegen
-            setattr(e, "lhs_ty", lhs_ty)
-            return _set_expr_ty(e, target)
-
-        if isinstance(e, EBinary):
+        if rhs not in self._known_tys and not self._is_known(rhs):
+            raise TypeError(e.loc, f"'is' right-hand side must be a type name, got '{rhs}'")
+        # Store the LHS type for codegen
+        e.lhs_ty = lhs_ty
+        return _set_expr_ty(e, "bool")
+
+    def _check_as(self, e: EAs, target_ty: Optional[str] = None) -> str:
+        lhs_ty = self._check_expr(e.expr)
+        target = e.type_name
+        if target not in self._known_tys and not self._is_known(target):
+            raise TypeError(e.loc, f"'as' target must be a type name, got '{target}'")
+        # LHS must be an interface type
+        if lhs_ty not in self.interfaces:
+            raise TypeError(e.loc, f"'as' requires an interface type on the left, got '{lhs_ty}'")
+        # Target must be a class that implements the interface
+        if target not in self.classes:
+            raise TypeError(e.loc, f"'as' target must be a class type, got '{target}'")
+        if (target, lhs_ty) not in self._impl_edges:
+            raise TypeError(e.loc, f"class '{target}' does not implement interface '{lhs_ty}'")
+        # Store the LHS type for codegen
+        e.lhs_ty = lhs_ty
+        return _set_expr_ty(e, target)
+
+    def _check_binary(self, e: EBinary, target_ty: Optional[str] = None) -> str:
+        # For binary ops, let integer/float literals adapt to the other operand's type.
+        # A literal LHS can neither fail nor steer the RHS, so check the RHS first
+        # and type the literal once instead of re-checking it afterwards.
+        lt, rt = type(e.lhs), type(e.rhs)
+        if lt is EInt or lt is EChar:
+            b = self._check_expr(e.rhs)
+            a = self._check_expr(e.lhs, target_ty=b if b in INT_TYPES else None)
+        elif lt is EFloat:
+            b = self._check_expr(e.rhs)
+            a = self._check_expr(e.lhs, target_ty=b if b in FLOAT_TYPES else None)
+        else:
             a = self._check_expr(e.lhs)
-            # For binary ops, let integer/float literals adapt to the other operand's type
-            if a in INT_TYPES and isinstance(e.rhs, (EInt, EChar)):
-                b = self._check_expr(e.rhs, target_ty=a)
-            elif a in FLOAT_TYPES and isinstance(e.rhs, EFloat):
+            if (a in INT_TYPES and (rt is EInt or rt is EChar)) or (a in FLOAT_TYPES and rt is EFloat):
                 b = self._check_expr(e.rhs, target_ty=a)
             else:
                 b = self._check_expr(e.rhs)
-            # Symmetric: if RHS resolved first and LHS is a literal, re-check LHS
-            if b in INT_TYPES and a == "i64" and isinstance(e.lhs, (EInt, EChar)) and b != "i64":
-                a = self._check_expr(e.lhs, target_ty=b)
-            elif b in FLOAT_TYPES and a == "f64" and isinstance(e.lhs, EFloat) and b != "f64":
-                a = self._check_expr(e.lhs, target_ty=b)
-            op = e.op
-            # Resolve enum types to i64 for operator checks
-            ra, rb = _resolve_enum_ty(a), _resolve_enum_ty(b)
-
-            if op in ("+", "-", "*", "/", "%"):
-                # str + str → str concatenation
-                if op == "+" and a == "str" and b == "str":
-                    return _set_expr_ty(e, "str")
-                if ra not in NUM_TYPES or rb not in NUM_TYPES:
-                    raise TypeError(e.loc, f"operator '{op}' requires numeric operands, got {a} and {b}")
-                if ra != rb:
-                    raise TypeError(e.loc, f"operator '{op}' requires same numeric type, got {a} and {b}")
-                return _set_expr_ty(e, a)
-
-            if op in ("&", "|", "^", "<<", ">>"):
-                if ra not in INT_TYPES or rb not in INT_TYPES:
-                    raise TypeError(e.loc, f"operator '{op}' requires integer operands, got {a} and {b}")
-                if ra != rb:
-                    raise TypeError(e.loc, f"operator '{op}' requires same integer type, got {a} and {b}")
-                return _set_expr_ty(e, a)
-
-            if op in ("<", "<=", ">", ">="):
-                if ra not in NUM_TYPES or rb not in NUM_TYPES:
-                    raise TypeError(e.loc, f"comparison '{op}' requires numeric operands, got {a} and {b}")
-                if ra != rb:
-                    raise TypeError(e.loc, f"comparison '{op}' requires same numeric type, got {a} and {b}")
-                return _set_expr_ty(e, "bool")
+        op = e.op
+        # Classify both operands once; enum types compare as i64
+        ca = self._ty_class.get(a, 0)
+        cb = self._ty_class.get(b, 0)
+        ra = "i64" if ca & _TC_ENUM else a
+        rb = "i64" if cb & _TC_ENUM else b
+
+        if op in ("+", "-", "*", "/", "%"):
+            # str + str → str concatenation
+            if op == "+" and a == "str" and b == "str":
+                return _set_expr_ty(e, "str")
+            if not (ca & _TC_NUM and cb & _TC_NUM):
+                raise TypeError(e.loc, f"operator '{op}' requires numeric operands, got {a} and {b}")
+            if ra != rb:
+                raise TypeError(e.loc, f"operator '{op}' requires same numeric type, got {a} and {b}")
+            return _set_expr_ty(e, a)
+
+        if op in ("&", "|", "^", "<<", ">>"):
+            if not (ca & _TC_INT and cb & _TC_INT):
+                raise TypeError(e.loc, f"operator '{op}' requires integer operands, got {a} and {b}")
+            if ra != rb:
+                raise TypeError(e.loc, f"operator '{op}' requires same integer type, got {a} and {b}")
+            return _set_expr_ty(e, a)
+
+        if op in ("<", "<=", ">", ">="):
+            if not (ca & _TC_NUM and cb & _TC_NUM):
+                raise TypeError(e.loc, f"comparison '{op}' requires numeric operands, got {a} and {b}")
+            if ra != rb:
+                raise TypeError(e.loc, f"comparison '{op}' requires same numeric type, got {a} and {b}")
+            return _set_expr_ty(e, "bool")
 
-            if op in ("==", "!="):
-                # allow comparing ref types with none
-                if a == "none" and _is_ref_type(b):
-                    return _set_expr_ty(e, "bool")
-                if b == "none" and _is_ref_type(a):
-                    return _set_expr_ty(e, "bool")
-                if ra != rb:
-                    raise TypeError(e.loc, f"equality '{op}' requires same types, got {a} and {b}")
+        if op in ("==", "!="):
+            # allow comparing ref types with none
+            if a == "none" and self._is_ref_type(b):
                 return _set_expr_ty(e, "bool")
-
-            if op in ("and", "or"):
-                if not _is_truthy_type(a) or not _is_truthy_type(b):
-                    raise TypeError(e.loc, f"'{op}' requires bool, integer, or reference operands, got {a} and {b}")
+            if b == "none" and self._is_ref_type(a):
                 return _set_expr_ty(e, "bool")
+            if ra != rb:
+                raise TypeError(e.loc, f"equality '{op}' requires same types, got {a} and {b}")
+            return _set_expr_ty(e, "bool")
 
-            raise TypeError(e.loc, f"unknown binary operator '{op}'")
-
-        if isinstance(e, ECall):
-            return self._check_call(e)
-
-        if isinstance(e, EMemberAccess):
-            # Check for enum variant access: EnumName.VARIANT
-            if isinstance(e.obj, EVar) and e.obj.name in _USER_ENUM_NAMES:
-                enum_name = e.obj.name
-                variants = self.enum_variants.get(enum_name, {})
-                if e.member not in variants:
-                    raise TypeError(e.loc, f"enum '{enum_name}' has no variant '{e.member}'")
-                return _set_expr_ty(e, enum_name)
-            obj_ty = self._check_expr(e.obj)
-            if obj_ty in self.interfaces:
-                raise TypeError(e.loc, f"cannot access fields on interface type '{obj_ty}'")
-            if obj_ty in self.structs:
-                si = self.structs[obj_ty]
-                if e.member not in si.fields:
-                    raise TypeError(e.loc, f"struct '{obj_ty}' has no field '{e.member}'")
-                return _set_expr_ty(e, si.fields[e.member])
-            if obj_ty not in self.classes:
-                raise TypeError(e.loc, f"member access on non-class type '{obj_ty}'")
-            ci = self.classes[obj_ty]
-            if e.member not in ci.fields:
-                raise TypeError(e.loc, f"class '{obj_ty}' has no field '{e.member}'")
-            return _set_expr_ty(e, ci.fields[e.member])
-
-        if isinstance(e, EIndex):
-            obj_ty = self._check_expr(e.obj)
-            idx_ty = self._check_expr(e.index)
-            if is_list_type(obj_ty):
-                if idx_ty != "i64":
-                    raise TypeError(e.loc, f"list index must be i64, got {idx_ty}")
-                elem = list_elem_type(obj_ty)
-                return _set_expr_ty(e, elem)
-            if is_dict_type(obj_ty):
-                key = dict_key_type(obj_ty)
-                if idx_ty != key:
-                    raise TypeError(e.loc, f"dict key must be {key}, got {idx_ty}")
-                val = dict_val_type(obj_ty)
-                return _set_expr_ty(e, val)
-            if obj_ty == "str":
-                if idx_ty != "i64":
-                    raise TypeError(e.loc, f"string index must be i64, got {idx_ty}")
-                return _set_expr_ty(e, "i64")
-            raise TypeError(e.loc, f"type '{obj_ty}' does not support subscript []")
-
-        if isinstance(e, ETuple):
-            target_elems = None
-            if target_ty and is_tuple_type(target_ty):
-                target_elems = tuple_elem_types(target_ty)
-                if len(target_elems) != len(e.elems):
-                    raise TypeError(e.loc, f"tuple has {len(e.elems)} elements, target type expects {len(target_elems)}")
-            elem_tys: List[str] = []
-            for i, elem in enumerate(e.elems):
-                elem_target = target_elems[i] if target_elems else None
-                ety = self._check_expr(elem, target_ty=elem_target)
-                if target_elems:
-                    if not _assignable(ety, target_elems[i]):
-                        raise TypeError(elem.loc, f"tuple element {i} has type {ety}, expected {target_elems[i]}")
-                elem_tys.append(ety)
+        if op in ("and", "or"):
+            if not self._is_truthy_type(a) or not self._is_truthy_type(b):
+                raise TypeError(e.loc, f"'{op}' requires bool, integer, or reference operands, got {a} and {b}")
+            return _set_expr_ty(e, "bool")
+
+        raise TypeError(e.loc, f"unknown binary operator '{op}'")
+
+    def _check_member_access(self, e: EMemberAccess, target_ty: Optional[str] = None) -> str:
+        # Check for enum variant access: EnumName.VARIANT
+        if isinstance(e.obj, EVar) and e.obj.name in self.enum_names:
+            enum_name = e.obj.name
+            variants = self.enum_variants.get(enum_name, {})
+            if e.member not in variants:
+                raise TypeError(e.loc, f"enum '{enum_name}' has no variant '{e.member}'")
+            return _set_expr_ty(e, enum_name)
+        obj_ty = self._check_expr(e.obj)
+        if obj_ty in self.interfaces:
+            raise TypeError(e.loc, f"cannot access fields on interface type '{obj_ty}'")
+        if obj_ty in self.structs:
+            si = self.structs[obj_ty]
+            if e.member not in si.fields:
+                raise TypeError(e.loc, f"struct '{obj_ty}' has no field '{e.member}'")
+            return _set_expr_ty(e, si.fields[e.member])
+        if obj_ty not in self.classes:
+            raise TypeError(e.loc, f"member access on non-class type '{obj_ty}'")
+        ci = self.classes[obj_ty]
+        if e.member not in ci.fields:
+            raise TypeError(e.loc, f"class '{obj_ty}' has no field '{e.member}'")
+        return _set_expr_ty(e, ci.fields[e.member])
+
+    def _check_index(self, e: EIndex, target_ty: Optional[str] = None) -> str:
+        obj_ty = self._check_expr(e.obj)
+        idx_ty = self._check_expr(e.index)
+        kind, parts = _type_shape(obj_ty) or ("", ())
+        if kind == "list":
+            if idx_ty != "i64":
+                raise TypeError(e.loc, f"list index must be i64, got {idx_ty}")
+            return _set_expr_ty(e, parts[0])
+        if kind == "dict":
+            key, val = parts
+            if idx_ty != key:
+                raise TypeError(e.loc, f"dict key must be {key}, got {idx_ty}")
+            return _set_expr_ty(e, val)
+        if obj_ty == "str":
+            if idx_ty != "i64":
+                raise TypeError(e.loc, f"string index must be i64, got {idx_ty}")
+            return _set_expr_ty(e, "i64")
+        raise TypeError(e.loc, f"type '{obj_ty}' does not support subscript []")
+
+    def _check_tuple(self, e: ETuple, target_ty: Optional[str] = None) -> str:
+        target_elems: List[str] = []
+        if target_ty and is_tuple_type(target_ty):
+            target_elems = tuple_elem_types(target_ty)
+            if len(target_elems) != len(e.elems):
+                raise TypeError(e.loc, f"tuple has {len(e.elems)} elements, target type expects {len(target_elems)}")
+        elem_tys: List[str] = []
+        for i, elem in enumerate(e.elems):
             if target_elems:
-                result_ty = target_ty
+                elem_target = target_elems[i]
+                ety = self._check_expr(elem, target_ty=elem_target)
+                if ety is not elem_target and not self._assignable(ety, elem_target):
+                    raise TypeError(elem.loc, f"tuple element {i} has type {ety}, expected {elem_target}")
             else:
-                result_ty = "(" + ",".join(elem_tys) + ")"
-            return _set_expr_ty(e, result_ty)
-
-        if isinstance(e, EListLit):
-            tp = e.elem_type
-            if not _is_known(tp):
-                raise TypeError(e.loc, f"unknown type parameter '{tp}' in List[{tp}]")
-            for i, elem in enumerate(e.elems):
-                ety = self._check_expr(elem, target_ty=tp)
-                if not _assignable(ety, tp):
-                    raise TypeError(elem.loc, f"list literal element {i+1} has type {ety}, expected {tp}")
-            return _set_expr_ty(e, f"List[{tp}]")
-
-        if isinstance(e, EDictLit):
-            ktp = e.key_type
-            tp = e.val_type
-            if not _is_known(ktp):
-                raise TypeError(e.loc, f"unknown key type '{ktp}' in Dict[{ktp},{tp}]")
-            if not _is_known(tp):
-                raise TypeError(e.loc, f"unknown value type '{tp}' in Dict[{ktp},{tp}]")
-            _check_dict_key_type(e.loc, ktp, self)
-            for i, key in enumerate(e.keys):
-                kty = self._check_expr(key, target_ty=ktp)
-                if kty != ktp:
-                    raise TypeError(key.loc, f"dict literal key {i+1} must be {ktp}, got {kty}")
-            for i, val in enumerate(e.vals):
-                vty = self._check_expr(val, target_ty=tp)
-                if not _assignable(vty, tp):
-                    raise TypeError(val.loc, f"dict literal value {i+1} has type {vty}, expected {tp}")
-            return _set_expr_ty(e, f"Dict[{ktp},{tp}]")
-
-        raise TypeError(e.loc, f"unhandled expression {type(e).__name__}")
-
-    def _check_call(self, e: ECall) -> str:
+                ety = self._check_expr(elem)
+            elem_tys.append(ety)
+        if target_ty and target_elems:
+            return _set_expr_ty(e, target_ty)
+        return _set_expr_ty(e, _tuple_ty(tuple(elem_tys)))
+
+    def _check_list_lit(self, e: EListLit, target_ty: Optional[str] = None) -> str:
+        tp = e.elem_type
+        if tp not in self._known_tys and not self._is_known(tp):
+            raise TypeError(e.loc, f"unknown type parameter '{tp}' in List[{tp}]")
+        for i, elem in enumerate(e.elems):
+            ety = self._check_expr(elem, target_ty=tp)
+            if ety is not tp and not self._assignable(ety, tp):
+                raise TypeError(elem.loc, f"list literal element {i+1} has type {ety}, expected {tp}")
+        return _set_expr_ty(e, _list_ty(tp))
+
+    def _check_dict_lit(self, e: EDictLit, target_ty: Optional[str] = None) -> str:
+        ktp = e.key_type
+        tp = e.val_type
+        if ktp not in self._known_tys and not self._is_known(ktp):
+            raise TypeError(e.loc, f"unknown key type '{ktp}' in Dict[{ktp},{tp}]")
+        if tp not in self._known_tys and not self._is_known(tp):
+            raise TypeError(e.loc, f"unknown value type '{tp}' in Dict[{ktp},{tp}]")
+        _check_dict_key_type(e.loc, ktp)
+        for i, key in enumerate(e.keys):
+            kty = self._check_expr(key, target_ty=ktp)
+            if kty != ktp:
+                raise TypeError(key.loc, f"dict literal key {i+1} must be {ktp}, got {kty}")
+        for i, val in enumerate(e.vals):
+            vty = self._check_expr(val, target_ty=tp)
+            if vty is not tp and not self._assignable(vty, tp):
+                raise TypeError(val.loc, f"dict literal value {i+1} has type {vty}, expected {tp}")
+        return _set_expr_ty(e, _dict_ty(ktp, tp))
+
+    def _check_call(self, e: ECall, target_ty: Optional[str] = None) -> str:
         # Method call: obj.method(args)
         if isinstance(e.callee, EMemberAccess):
             obj_ty = self._check_expr(e.callee.obj)
-            # Interface method call
-            if obj_ty in self.interfaces:
-                ii = self.interfaces[obj_ty]
-                mname = e.callee.member
-                if mname not in ii.methods:
-                    raise TypeError(e.loc, f"interface '{obj_ty}' has no method '{mname}'")
-                param_tys, ret_ty = ii.methods[mname]
-                if len(param_tys) != len(e.args):
-                    raise TypeError(e.loc, f"method '{mname}' expects {len(param_tys)} args (excl self), got {len(e.args)}")
-                for i, (pt, arg) in enumerate(zip(param_tys, e.args)):
-                    at = self._check_expr(arg, target_ty=pt)
-                    if not _assignable(at, pt):
-                        raise TypeError(arg.loc, f"argument {i+1} of '{mname}' expected {pt}, got {at}")
-                return _set_expr_ty(e, ret_ty)
-            # Class method call
-            if obj_ty in self.structs:
-                si = self.structs[obj_ty]
-                mname = e.callee.member
-                if mname not in si.methods:
-                    raise TypeError(e.loc, f"struct '{obj_ty}' has no method '{mname}'")
-                param_tys, ret_ty = si.methods[mname]
-                if len(param_tys) != len(e.args):
-                    raise TypeError(e.loc, f"method '{mname}' expects {len(param_tys)} args (excl self), got {len(e.args)}")
-                for i, (pt, arg) in enumerate(zip(param_tys, e.args)):
-                    at = self._check_expr(arg, target_ty=pt)
-                    if not _assignable(at, pt):
-                        raise TypeError(arg.loc, f"argument {i+1} of '{mname}' expected {pt}, got {at}")
-                return _set_expr_ty(e, ret_ty)
-            if obj_ty not in self.classes:
-                raise TypeError(e.loc, f"method call on non-class type '{obj_ty}'")
-            ci = self.classes[obj_ty]
             mname = e.callee.member
-            if mname not in ci.methods:
-                raise TypeError(e.loc, f"class '{obj_ty}' has no method '{mname}'")
-            param_tys, ret_ty = ci.methods[mname]
-            if len(param_tys) != len(e.args):
-                raise TypeError(e.loc, f"method '{mname}' expects {len(param_tys)} args (excl self), got {len(e.args)}")
-            for i, (pt, arg) in enumerate(zip(param_tys, e.args)):
-                at = self._check_expr(arg, target_ty=pt)
-                if not _assignable(at, pt):
-                    raise TypeError(arg.loc, f"argument {i+1} of '{mname}' expected {pt}, got {at}")
+            owner = self._method_owners.get(obj_ty)
+            if owner is None:
+                raise TypeError(e.loc, f"method call on non-class type '{obj_ty}'")
+            kind, methods = owner
+            sig = methods.get(mname)
+            if sig is None:
+                raise TypeError(e.loc, f"{kind} '{obj_ty}' has no method '{mname}'")
+            param_tys, ret_ty = sig
+            nargs = len(e.args)
+            if len(param_tys) != nargs:
+                raise TypeError(e.loc, f"method '{mname}' expects {len(param_tys)} args (excl self), got {nargs}")
+            self._check_args(e.args, param_tys, mname)
             return _set_expr_ty(e, ret_ty)
 
         # Expression-based function pointer call: e.g. ops[0](3, 4) or get_fn()(x)
         if not isinstance(e.callee, EVar):
             callee_ty = self._check_expr(e.callee)
             if is_fn_type(callee_ty):
-                param_tys = fn_param_types(callee_ty)
+                param_tys = _fn_params(callee_ty)
                 ret_ty = fn_ret_type(callee_ty)
-                if len(param_tys) != len(e.args):
-                    raise TypeError(e.loc, f"function pointer expects {len(param_tys)} args, got {len(e.args)}")
-                for i, (pt, arg) in enumerate(zip(param_tys, e.args)):
-                    at = self._check_expr(arg, target_ty=pt)
-                    if not _assignable(at, pt):
-                        raise TypeError(arg.loc, f"argument {i+1} of function pointer expected {pt}, got {at}")
+                nargs = len(e.args)
+                if len(param_tys) != nargs:
+                    raise TypeError(e.loc, f"function pointer expects {len(param_tys)} args, got {nargs}")
+                self._check_args(e.args, param_tys, None, kind="function pointer")
                 return _set_expr_ty(e, ret_ty)
             raise TypeError(e.loc, "callee must be identifier")
 
         name = e.callee.name
 
-        # Function pointer call: variable with Fn(...) type
-        if name not in self.funcs and name not in CAST_TYPES and name not in ("print", "range", "keys", "len", "format") and name not in GENERIC_CONTAINER_OPS and name not in self.classes and name not in self.interfaces and name not in self.generic_funcs:
-            # Check if it's a variable with Fn type
-            try:
-                vi = self._lookup(name, e.loc)
-                if is_fn_type(vi.ty):
-                    param_tys = fn_param_types(vi.ty)
+        # Names that can't be a builtin, constructor or generic: plain user
+        # function calls (the common case) and function-pointer variables
+        if name not in self._reserved_call_names:
+            sig = self.funcs.get(name)
+            if sig is not None:
+                # A struct of the same name still wins, via the long path below
+                if name not in self.structs:
+                    return self._check_func_call(e, name, sig)
+            else:
+                # Function pointer call: variable with Fn(...) type
+                vi = self._try_lookup(name)
+                if vi is not None and is_fn_type(vi.ty):
+                    param_tys = _fn_params(vi.ty)
                     ret_ty = fn_ret_type(vi.ty)
-                    if len(param_tys) != len(e.args):
-                        raise TypeError(e.loc, f"function pointer '{name}' expects {len(param_tys)} args, got {len(e.args)}")
-                    for i, (pt, arg) in enumerate(zip(param_tys, e.args)):
-                        at = self._check_expr(arg, target_ty=pt)
-                        if not _assignable(at, pt):
-                            raise TypeError(arg.loc, f"argument {i+1} of function pointer '{name}' expected {pt}, got {at}")
+                    nargs = len(e.args)
+                    if len(param_tys) != nargs:
+                        raise TypeError(e.loc, f"function pointer '{name}' expects {len(param_tys)} args, got {nargs}")
+                    self._check_args(e.args, param_tys, name, kind="function pointer")
                     return _set_expr_ty(e, ret_ty)
-            except TypeError:
-                pass
-
-        # Type cast builtins: i8(x), i16(x), i32(x), i64(x), f32(x), f64(x)
-        if name in CAST_TYPES:
-            if len(e.args) != 1:
-                raise TypeError(e.loc, f"{name}() expects 1 argument")
-            aty = self._check_expr(e.args[0])
-            raty = _resolve_enum_ty(aty)
-            if raty not in NUM_TYPES:
-                raise TypeError(e.loc, f"{name}() requires a numeric argument, got {aty}")
-            return _set_expr_ty(e, name)
 
-        # print is special (overloaded by arg type)
-        if name == "print":
-            if len(e.args) != 1:
-                raise TypeError(e.loc, "print(x) expects 1 argument")
-            aty = self._check_expr(e.args[0])
-            raty = _resolve_enum_ty(aty)
-            if raty not in NUM_TYPES and raty not in ("bool", "str"):
-                raise TypeError(e.loc, f"print() does not support type {aty}")
-            return _set_expr_ty(e, "void")
-
-        # format() — variadic string formatting, returns str
-        if name == "format":
-            if len(e.args) < 1:
-                raise TypeError(e.loc, "format() expects at least 1 argument (the format string)")
-            fmt_ty = self._check_expr(e.args[0])
-            if fmt_ty != "str":
-                raise TypeError(e.args[0].loc, f"format() first argument must be str, got {fmt_ty}")
-            for i, arg in enumerate(e.args[1:], start=2):
-                aty = self._check_expr(arg)
-                raty = _resolve_enum_ty(aty)
-                if raty not in NUM_TYPES and raty not in ("bool", "str"):
-                    raise TypeError(arg.loc, f"format() argument {i} has unsupported type {aty}")
-            return _set_expr_ty(e, "str")
-
-        # range() is special (1-3 i64 args, returns List[i64])
-        if name == "range":
-            if len(e.args) < 1 or len(e.args) > 3:
-                raise TypeError(e.loc, f"range() expects 1-3 arguments, got {len(e.args)}")
-            for i, arg in enumerate(e.args):
-                at = self._check_expr(arg)
-                if at != "i64":
-                    raise TypeError(arg.loc, f"argument {i+1} of 'range' must be i64, got {at}")
-            return _set_expr_ty(e, "List[i64]")
-
-        # keys() is special (1 dict arg, returns List[K])
-        if name == "keys":
-            if len(e.args) != 1:
-                raise TypeError(e.loc, "keys() expects 1 argument")
-            at = self._check_expr(e.args[0])
-            if not is_dict_type(at):
-                raise TypeError(e.loc, f"keys() requires a dict type, got {at}")
-            k = dict_key_type(at)
-            return _set_expr_ty(e, f"List[{k}]")
-
-        # len() — overloaded, works on list/dict/str (no type param needed)
-        if name == "len":
-            if len(e.args) != 1:
-                raise TypeError(e.loc, "len() expects 1 argument")
-            at = self._check_expr(e.args[0])
-            if is_list_type(at) or is_dict_type(at) or at == "str":
-                return _set_expr_ty(e, "i64")
-            raise TypeError(e.loc, f"len() does not support type {at}")
-
-        # Generic container operations: name[T](...) or name[K,V](...) with explicit type param
-        if e.type_param is not None and name in GENERIC_CONTAINER_OPS:
-            tp = e.type_param
-            # For dict ops, tp is "K,V" — validate both parts
-            if name in _DICT_GENERIC_OPS or name == "Dict":
-                k, v = _split_dict_inner(tp)
-                if not _is_known(k):
-                    raise TypeError(e.loc, f"unknown key type '{k}' in '{name}[{tp}]'")
-                if not _is_known(v):
-                    raise TypeError(e.loc, f"unknown value type '{v}' in '{name}[{tp}]'")
-                _check_dict_key_type(e.loc, k, self)
-            else:
-                if not _is_known(tp):
-                    raise TypeError(e.loc, f"unknown type parameter '{tp}' in '{name}[{tp}]'")
-            param_tys, ret_ty = GENERIC_CONTAINER_OPS[name](tp)
-            if len(param_tys) != len(e.args):
-                raise TypeError(e.loc, f"'{name}[{tp}]' expects {len(param_tys)} args, got {len(e.args)}")
-            for i, (pt, arg) in enumerate(zip(param_tys, e.args)):
-                at = self._check_expr(arg, target_ty=pt)
-                if not _assignable(at, pt):
-                    raise TypeError(arg.loc, f"argument {i+1} of '{name}[{tp}]' expected {pt}, got {at}")
-            return _set_expr_ty(e, ret_ty)
-
-        # Type inference for generic container ops (no explicit type param)
-        if e.type_param is None and name in GENERIC_CONTAINER_OPS and name not in ("List", "Dict") and len(e.args) > 0:
-            # Infer T from first argument's type
-            first_ty = self._check_expr(e.args[0])
-            inferred_tp = None
-            if name in _LIST_GENERIC_OPS and is_list_type(first_ty):
-                inferred_tp = list_elem_type(first_ty)
-            elif name in _DICT_GENERIC_OPS and is_dict_type(first_ty):
-                # Infer full "K,V" from Dict[K,V]
-                inferred_tp = first_ty[5:-1]  # extract "K,V" from "Dict[K,V]"
-            if inferred_tp is not None:
-                e.type_param = inferred_tp
-                param_tys, ret_ty = GENERIC_CONTAINER_OPS[name](inferred_tp)
-                if len(param_tys) != len(e.args):
-                    raise TypeError(e.loc, f"'{name}' expects {len(param_tys)} args, got {len(e.args)}")
-                # first arg already checked
-                for i, (pt, arg) in enumerate(zip(param_tys, e.args)):
-                    if i == 0:
-                        continue  # already checked
-                    at = self._check_expr(arg, target_ty=pt)
-                    if not _assignable(at, pt):
-                        raise TypeError(arg.loc, f"argument {i+1} of '{name}' expected {pt}, got {at}")
-                return _set_expr_ty(e, ret_ty)
-
-        # Generic container ops with explicit type_param (for unknown ops, raise error)
-        if e.type_param is not None and name not in GENERIC_CONTAINER_OPS:
-            # Could be a user-defined generic function — check below
-            pass
-
-        # Check builtin signature table
-        if name in BUILTIN_SIGS:
-            param_tys, ret_ty = BUILTIN_SIGS[name]
-            if len(param_tys) != len(e.args):
-                raise TypeError(e.loc, f"builtin '{name}' expects {len(param_tys)} args, got {len(e.args)}")
-            for i, (pt, arg) in enumerate(zip(param_tys, e.args)):
-                at = self._check_expr(arg)
-                if at != pt:
-                    raise TypeError(arg.loc, f"argument {i+1} of '{name}' expected {pt}, got {at}")
-            return _set_expr_ty(e, ret_ty)
+        # Builtins and generic container ops, dispatched on the callee name. A
+        # handler may decline (return None) and leave the call to the lookups below.
+        builtin = _BUILTIN_DISPATCH.get(name)
+        if builtin is not None:
+            ty = builtin(self, e, name)
+            if ty is not None:
+                return ty
 
         # Interfaces cannot be constructed
         if name in self.interfaces:
@@ -1324,13 +1305,11 @@ class TypeChecker:
 
         # Constructor call: ClassName(args)
         if name in self.classes:
-            ci = self.classes[name]
-            if len(ci.init_params) != len(e.args):
-                raise TypeError(e.loc, f"constructor '{name}' expects {len(ci.init_params)} args, got {len(e.args)}")
-            for i, (pt, arg) in enumerate(zip(ci.init_params, e.args)):
-                at = self._check_expr(arg, target_ty=pt)
-                if not _assignable(at, pt):
-                    raise TypeError(arg.loc, f"argument {i+1} of constructor '{name}' expected {pt}, got {at}")
+            init_params = self.classes[name].init_params
+            nargs = len(e.args)
+            if len(init_params) != nargs:
+                raise TypeError(e.loc, f"constructor '{name}' expects {len(init_params)} args, got {nargs}")
+            self._check_args(e.args, init_params, name, kind="constructor")
             return _set_expr_ty(e, name)
 
         # Struct construction: StructName(field1, field2, ...) positional by field order
@@ -1342,7 +1321,7 @@ class TypeChecker:
             for i, fname in enumerate(si.field_order):
                 fty = si.fields[fname]
                 at = self._check_expr(e.args[i], target_ty=fty)
-                if not _assignable(at, fty):
+                if at is not fty and not self._assignable(at, fty):
                     raise TypeError(e.args[i].loc, f"field '{fname}' of struct '{name}' expected {fty}, got {at}")
             return _set_expr_ty(e, name)
 
@@ -1351,18 +1330,144 @@ class TypeChecker:
             return self._check_generic_call(e, name)
 
         # user functions
-        if name not in self.funcs:
+        sig = self.funcs.get(name)
+        if sig is None:
             raise TypeError(e.loc, f"unknown function '{name}'")
+        return self._check_func_call(e, name, sig)
+
+    def _check_cast_call(self, e: ECall, name: str) -> str:
+        """Type casts: i8(x), i16(x), ..., f64(x) -- one numeric argument."""
+        if len(e.args) != 1:
+            raise TypeError(e.loc, f"{name}() expects 1 argument")
+        aty = self._check_expr(e.args[0])
+        if not self._ty_class.get(aty, 0) & _TC_NUM:
+            raise TypeError(e.loc, f"{name}() requires a numeric argument, got {aty}")
+        return _set_expr_ty(e, name)
+
+    def _check_print_call(self, e: ECall, name: str) -> str:
+        """print(x) -- overloaded on the argument type."""
+        if len(e.args) != 1:
+            raise TypeError(e.loc, "print(x) expects 1 argument")
+        aty = self._check_expr(e.args[0])
+        if not self._ty_class.get(aty, 0) & _TC_PRINTABLE:
+            raise TypeError(e.loc, f"print() does not support type {aty}")
+        return _set_expr_ty(e, "void")
+
+    def _check_format_call(self, e: ECall, name: str) -> str:
+        """format(fmt, args...) -- variadic string formatting, returns str."""
+        if len(e.args) < 1:
+            raise TypeError(e.loc, "format() expects at least 1 argument (the format string)")
+        fmt_ty = self._check_expr(e.args[0])
+        if fmt_ty != "str":
+            raise TypeError(e.args[0].loc, f"format() first argument must be str, got {fmt_ty}")
+        for i, arg in enumerate(e.args[1:], start=2):
+            aty = self._check_expr(arg)
+            if not self._ty_class.get(aty, 0) & _TC_PRINTABLE:
+                raise TypeError(arg.loc, f"format() argument {i} has unsupported type {aty}")
+        return _set_expr_ty(e, "str")
+
+    def _check_range_call(self, e: ECall, name: str) -> str:
+        """range(...) -- 1-3 i64 arguments, returns List[i64]."""
+        if len(e.args) < 1 or len(e.args) > 3:
+            raise TypeError(e.loc, f"range() expects 1-3 arguments, got {len(e.args)}")
+        for i, arg in enumerate(e.args):
+            at = self._check_expr(arg)
+            if at != "i64":
+                raise TypeError(arg.loc, f"argument {i+1} of 'range' must be i64, got {at}")
+        return _set_expr_ty(e, "List[i64]")
+
+    def _check_keys_call(self, e: ECall, name: str) -> str:
+        """keys(d) -- one dict argument, returns List[K]."""
+        if len(e.args) != 1:
+            raise TypeError(e.loc, "keys() expects 1 argument")
+        at = self._check_expr(e.args[0])
+        kind, parts = _type_shape(at) or ("", ())
+        if kind != "dict":
+            raise TypeError(e.loc, f"keys() requires a dict type, got {at}")
+        return _set_expr_ty(e, _list_ty(parts[0]))
+
+    def _check_len_call(self, e: ECall, name: str) -> str:
+        """len(x) -- overloaded on list/dict/str."""
+        if len(e.args) != 1:
+            raise TypeError(e.loc, "len() expects 1 argument")
+        at = self._check_expr(e.args[0])
+        if is_list_type(at) or is_dict_type(at) or at == "str":
+            return _set_expr_ty(e, "i64")
+        raise TypeError(e.loc, f"len() does not support type {at}")
 
-        param_tys, ret_ty = self.funcs[name]
-        if len(param_tys) != len(e.args):
-            raise TypeError(e.loc, f"function '{name}' expects {len(param_tys)} args, got {len(e.args)}")
-
-        for i, (pt, arg) in enumerate(zip(param_tys, e.args)):
-            at = self._check_expr(arg, target_ty=pt)
-            if at != pt and not _assignable(at, pt):
-                raise TypeError(arg.loc, f"argument {i+1} of '{name}' expected {pt}, got {at}")
+    def _check_container_op_call(self, e: ECall, name: str) -> Optional[str]:
+        """Generic container ops (List[T](), append(), put[K,V](), ...). Returns None
+        when no type parameter is given and none can be inferred, so the call
+        falls through to the user-defined lookups."""
+        # Generic container operations: name[T](...) or name[K,V](...) with explicit type param
+        if e.type_param is not None:
+            tp = e.type_param
+            # For dict ops, tp is "K,V" — validate both parts
+            if name in _DICT_GENERIC_OPS or name == "Dict":
+                k, v = _split_dict_inner(tp)
+                if k not in self._known_tys and not self._is_known(k):
+                    raise TypeError(e.loc, f"unknown key type '{k}' in '{name}[{tp}]'")
+                if v not in self._known_tys and not self._is_known(v):
+                    raise TypeError(e.loc, f"unknown value type '{v}' in '{name}[{tp}]'")
+                _check_dict_key_type(e.loc, k)
+            else:
+                if tp not in self._known_tys and not self._is_known(tp):
+                    raise TypeError(e.loc, f"unknown type parameter '{tp}' in '{name}[{tp}]'")
+            param_tys, ret_ty, label = _container_op_sig(name, tp)
+            nargs = len(e.args)
+            if len(param_tys) != nargs:
+                raise TypeError(e.loc, f"'{label}' expects {len(param_tys)} args, got {nargs}")
+            self._check_args(e.args, param_tys, label)
+            return _set_expr_ty(e, ret_ty)
 
+        # Type inference for generic container ops (no explicit type param)
+        if name not in ("List", "Dict") and len(e.args) > 0:
+            # Infer T from first argument's type
+            first_ty = self._check_expr(e.args[0])
+            inferred_tp = None
+            if name in _LIST_GENERIC_OPS and is_list_type(first_ty):
+                inferred_tp = list_elem_type(first_ty)
+            elif name in _DICT_GENERIC_OPS and is_dict_type(first_ty):
+                # Infer full "K,V" from Dict[K,V]
+                inferred_tp = first_ty[5:-1]  # extract "K,V" from "Dict[K,V]"
+            if inferred_tp is not None:
+                e.type_param = inferred_tp
+                param_tys, ret_ty, _ = _container_op_sig(name, inferred_tp)
+                nargs = len(e.args)
+                if len(param_tys) != nargs:
+                    raise TypeError(e.loc, f"'{name}' expects {len(param_tys)} args, got {nargs}")
+                # first arg already checked
+                self._check_args(e.args, param_tys, name, start=1)
+                return _set_expr_ty(e, ret_ty)
+        return None
+
+    def _check_args(self, args: List[Expr], param_tys: Sequence[str], name: Optional[str],
+                    kind: str = "", start: int = 0) -> None:
+        """Check call arguments against param_tys (arity already verified by the
+        caller). Diagnostics name the callee as "{kind} '{name}'", as plain
+        '{name}' when there is no kind, or as plain {kind} when there is no name."""
+        check_expr = self._check_expr
+        assignable = self._assignable
+        for i in range(start, len(args)):
+            arg = args[i]
+            pt = param_tys[i]
+            at = check_expr(arg, pt)
+            if at is not pt and not assignable(at, pt):
+                if name is None:
+                    callee = kind
+                elif kind:
+                    callee = f"{kind} '{name}'"
+                else:
+                    callee = f"'{name}'"
+                raise TypeError(arg.loc, f"argument {i+1} of {callee} expected {pt}, got {at}")
+
+    def _check_func_call(self, e: ECall, name: str, sig: Tuple[Tuple[str, ...], str]) -> str:
+        """Check a call to the (non-generic) user function `name` with signature sig."""
+        param_tys, ret_ty = sig
+        nargs = len(e.args)
+        if len(param_tys) != nargs:
+            raise TypeError(e.loc, f"function '{name}' expects {len(param_tys)} args, got {nargs}")
+        self._check_args(e.args, param_tys, name)
         return _set_expr_ty(e, ret_ty)
 
     def _check_generic_call(self, e: ECall, name: str) -> str:
@@ -1375,177 +1480,309 @@ class TypeChecker:
         # Determine concrete type parameter
         if e.type_param is not None:
             concrete_tp = e.type_param
-            if not _is_known(concrete_tp):
+            if concrete_tp not in self._known_tys and not self._is_known(concrete_tp):
                 raise TypeError(e.loc, f"unknown type parameter '{concrete_tp}' in '{name}[{concrete_tp}]'")
         else:
             # Infer type parameter from arguments
             concrete_tp = self._infer_user_generic_type(gf, arg_types, e.loc)
             e.type_param = concrete_tp
 
-        # Build type substitution map
-        type_sub = {gf.type_params[0]: concrete_tp}
-
-        # Substitute types in param list and return type
-        param_tys = [_subst_type_name(p.ty.name, type_sub) for p in gf.params]
-        ret_ty = _subst_type_name(gf.ret.name, type_sub)
+        key = (name, concrete_tp)
+        mangled = self._generic_mangled.get(key)
+        if mangled is None:
+            mangled = self._generic_mangled[key] = _intern(f"{name}_{_elem_tag(concrete_tp)}")
+
+        # An existing instantiation already has its signature in self.funcs.
+        # Otherwise substitute it once, then create and register the concrete
+        # instantiation; its body is checked from the worklist once the current
+        # body is finished.
+        sig = self.funcs.get(mangled)
+        if sig is None:
+            type_sub = {gf.type_params[0]: concrete_tp}
+            sig = self.funcs[mangled] = (
+                tuple(_subst_type_name(p.ty.name, type_sub) for p in gf.params),
+                _subst_type_name(gf.ret.name, type_sub),
+            )
+            concrete_func = _instantiate_func(gf, type_sub, mangled)
+            self.prog.funcs.append(concrete_func)
+            self._pending_insts.append(concrete_func)
+        param_tys, ret_ty = sig
 
         # Validate arity and arg types
         if len(param_tys) != len(e.args):
             raise TypeError(e.loc, f"'{name}' expects {len(param_tys)} args, got {len(e.args)}")
         for i, (pt, at) in enumerate(zip(param_tys, arg_types)):
-            if not _assignable(at, pt):
+            if at is not pt and not self._assignable(at, pt):
                 raise TypeError(e.args[i].loc, f"argument {i+1} of '{name}' expected {pt}, got {at}")
 
-        # Create and register the concrete instantiation if not already done
-        tag = _elem_tag(concrete_tp)
-        mangled = f"{name}_{tag}"
-        if mangled not in self.funcs:
-            concrete_func = _instantiate_func(gf, type_sub, mangled)
-            self.funcs[mangled] = (param_tys, ret_ty)
-            self.prog.funcs.append(concrete_func)
-            # Typecheck the concrete instantiation
-            self._check_func(concrete_func)
-
         return _set_expr_ty(e, ret_ty)
 
-    def _infer_user_generic_type(self, gf: FuncDecl, arg_types: List[str], loc) -> str:
+    def _infer_user_generic_type(self, gf: FuncDecl, arg_types: List[str], loc: SrcLoc) -> str:
         """Infer the type parameter from argument types for a user-defined generic function."""
-        tp_name = gf.type_params[0]  # e.g. "T"
-        for p, at in zip(gf.params, arg_types):
-            pt = p.ty.name
-            if pt == tp_name:
+        plan = self._infer_plans.get(gf.name)
+        if plan is None:
+            plan = self._infer_plans[gf.name] = _infer_plan(gf)
+        nargs = len(arg_types)
+        for i, kind in plan:
+            if i >= nargs:
+                break
+            at = arg_types[i]
+            if kind == "direct":
                 return at
-            if is_list_type(pt) and pt[5:-1] == tp_name and is_list_type(at):
-                return list_elem_type(at)
-            if is_dict_type(pt) and is_dict_type(at):
-                # Match val type of Dict[K,T] against Dict[K,V]
-                pt_val = dict_val_type(pt)
-                if pt_val == tp_name:
-                    return dict_val_type(at)
-        raise TypeError(loc, f"cannot infer type parameter '{tp_name}' for generic function '{gf.name}'")
+            # List[T] matches a list argument's element, Dict[K,T] a dict argument's value
+            akind, parts = _type_shape(at) or ("", ())
+            if akind == kind:
+                return parts[-1]
+        raise TypeError(loc, f"cannot infer type parameter '{gf.type_params[0]}' for generic function '{gf.name}'")
+
+
+def _infer_plan(gf: FuncDecl) -> List[Tuple[int, str]]:
+    """(param index, kind) for each parameter the type parameter can be read
+    from, in order: "direct" (T), "list" (List[T]) or "dict" (Dict[K,T])."""
+    tp_name = gf.type_params[0]  # e.g. "T"
+    plan: List[Tuple[int, str]] = []
+    for i, p in enumerate(gf.params):
+        pt = p.ty.name
+        if pt == tp_name:
+            plan.append((i, "direct"))
+            continue
+        kind, parts = _type_shape(pt) or ("", ())
+        if kind in ("list", "dict") and parts[-1] == tp_name:
+            plan.append((i, kind))
+    return plan
+
+
+# Statement / expression checkers, keyed on exact AST node class. AST classes are
+# never subclassed, so here and in _check_body / the instantiation clone an exact
+# type() test or dict lookup replaces an isinstance() cascade.
+_STMT_HANDLERS: Dict[type, Callable[[TypeChecker, Any], None]] = {
+    SVarDecl: TypeChecker._check_var_decl,
+    SAssign: TypeChecker._check_assign,
+    SMemberAssign: TypeChecker._check_member_assign,
+    SIndexAssign: TypeChecker._check_index_assign,
+    SExpr: TypeChecker._check_expr_stmt,
+    SReturn: TypeChecker._check_return,
+    SBreak: TypeChecker._check_break,
+    SContinue: TypeChecker._check_continue,
+    STupleDestructure: TypeChecker._check_tuple_destructure,
+}
 
+# (literal leaves are typed inline by _check_expr and have no entry)
+_EXPR_HANDLERS: Dict[type, Callable[[TypeChecker, Any, Optional[str]], str]] = {
+    EVar: TypeChecker._check_var,
+    EUnary: TypeChecker._check_unary,
+    EIs: TypeChecker._check_is,
+    EAs: TypeChecker._check_as,
+    EBinary: TypeChecker._check_binary,
+    ECall: TypeChecker._check_call,
+    EMemberAccess: TypeChecker._check_member_access,
+    EIndex: TypeChecker._check_index,
+    ETuple: TypeChecker._check_tuple,
+    EListLit: TypeChecker._check_list_lit,
+    EDictLit: TypeChecker._check_dict_lit,
+}
+
+
+# Builtin call handlers keyed on callee name (see _check_call)
+_BUILTIN_DISPATCH = {
+    **{name: TypeChecker._check_cast_call for name in CAST_TYPES},
+    "print": TypeChecker._check_print_call,
+    "format": TypeChecker._check_format_call,
+    "range": TypeChecker._check_range_call,
+    "keys": TypeChecker._check_keys_call,
+    "len": TypeChecker._check_len_call,
+    **{name: TypeChecker._check_container_op_call for name in GENERIC_CONTAINER_OPS},
+}
 
 # ---- helpers for elem tags (shared with codegen) ----
 _PRIM_TAG = {"i64": "I64", "f64": "F64", "f32": "F32", "bool": "BOOL", "str": "STR",
              "i8": "I8", "i16": "I16", "i32": "I32",
              "u8": "U8", "u16": "U16", "u32": "U32", "u64": "U64"}
 
+@lru_cache(maxsize=None)
 def _elem_tag(elem_ty: str) -> str:
-    return _PRIM_TAG.get(elem_ty, elem_ty)
+    """i64 -> I64, Person -> Person, List[i64] -> List_I64, Dict[str,i64] -> Dict_STR_I64.
+    Must produce the same tags as codegen's _elem_tag, which mangles generic
+    instantiation names the same way."""
+    tag = _PRIM_TAG.get(elem_ty)
+    if tag is not None:
+        return tag
+    shape = _type_shape(elem_ty)
+    if shape is not None:
+        kind, parts = shape
+        if kind == "list":
+            return _intern(f"List_{_elem_tag(parts[0])}")
+        if kind == "dict":
+            return _intern(f"Dict_{_elem_tag(parts[0])}_{_elem_tag(parts[1])}")
+        return _intern("Tuple_" + "_".join(_elem_tag(e) for e in parts))
+    if is_fn_type(elem_ty):
+        ret = fn_ret_type(elem_ty)
+        ret_tag = _elem_tag(ret) if ret != "void" else "VOID"
+        params = "_".join(_elem_tag(p) for p in fn_param_types(elem_ty)) or "VOID"
+        return _intern(f"__lang_rt_Fn_{params}__{ret_tag}")
+    return elem_ty
 
 
 # ---- AST substitution for monomorphization ----
 
 def _subst_type_name(name: str, sub: Dict[str, str]) -> str:
-    if name in sub:
-        return sub[name]
-    if name.startswith("List[") and name.endswith("]"):
-        inner = _subst_type_name(name[5:-1], sub)
-        return f"List[{inner}]"
-    if name.startswith("Dict[") and name.endswith("]"):
-        k, v = _split_dict_inner(name[5:-1])
-        k_sub = _subst_type_name(k, sub)
-        v_sub = _subst_type_name(v, sub)
-        return f"Dict[{k_sub},{v_sub}]"
-    if is_tuple_type(name):
-        elems = tuple_elem_types(name)
-        subbed = [_subst_type_name(e, sub) for e in elems]
-        return "(" + ",".join(subbed) + ")"
-    return name
+    r = sub.get(name)
+    if r is not None:
+        return r
+    shape = _type_shape(name)
+    if shape is None:
+        return name
+    # Composites that mention no type parameter come back as the same object
+    kind, parts = shape
+    if kind == "list":
+        elem = _subst_type_name(parts[0], sub)
+        return name if elem is parts[0] else _list_ty(elem)
+    if kind == "dict":
+        k = _subst_type_name(parts[0], sub)
+        v = _subst_type_name(parts[1], sub)
+        return name if k is parts[0] and v is parts[1] else _dict_ty(k, v)
+    elems = tuple([_subst_type_name(e, sub) for e in parts])
+    return name if elems == parts else _tuple_ty(elems)
 
 
 def _instantiate_func(gf: FuncDecl, type_sub: Dict[str, str], mangled_name: str) -> FuncDecl:
     """Create a concrete FuncDecl from a generic template by substituting type params."""
-    concrete = copy.deepcopy(gf)
-    concrete.name = mangled_name
-    concrete.type_params = []
-
-    # Substitute param types
-    for p in concrete.params:
-        p.ty = TypeRef(p.ty.loc, _subst_type_name(p.ty.name, type_sub))
-
-    # Substitute return type
-    concrete.ret = TypeRef(concrete.ret.loc, _subst_type_name(concrete.ret.name, type_sub))
-
-    # Substitute in body
-    _subst_block(concrete.body, type_sub)
-    return concrete
-
-
-def _subst_block(block, type_sub: Dict[str, str]) -> None:
-    for st in block.stmts:
-        _subst_stmt(st, type_sub)
-
-
-def _subst_stmt(st, type_sub: Dict[str, str]) -> None:
-    if isinstance(st, SVarDecl):
-        if st.ty is not None:
-            st.ty = TypeRef(st.ty.loc, _subst_type_name(st.ty.name, type_sub))
-        _subst_expr(st.value, type_sub)
-    elif isinstance(st, STupleDestructure):
-        _subst_expr(st.value, type_sub)
-    elif isinstance(st, SAssign):
-        _subst_expr(st.value, type_sub)
-    elif isinstance(st, SMemberAssign):
-        _subst_expr(st.obj, type_sub)
-        _subst_expr(st.value, type_sub)
-    elif isinstance(st, SIndexAssign):
-        _subst_expr(st.obj, type_sub)
-        _subst_expr(st.index, type_sub)
-        _subst_expr(st.value, type_sub)
-    elif isinstance(st, SExpr):
-        _subst_expr(st.expr, type_sub)
-    elif isinstance(st, SReturn):
-        if st.value:
-            _subst_expr(st.value, type_sub)
-    elif isinstance(st, SIf):
-        for arm in st.arms:
-            if arm.cond:
-                _subst_expr(arm.cond, type_sub)
-            _subst_block(arm.block, type_sub)
-    elif isinstance(st, SWhile):
-        _subst_expr(st.cond, type_sub)
-        _subst_block(st.body, type_sub)
-    elif isinstance(st, SFor):
-        st.var_ty = TypeRef(st.var_ty.loc, _subst_type_name(st.var_ty.name, type_sub))
-        _subst_expr(st.iterable, type_sub)
-        _subst_block(st.body, type_sub)
-    elif isinstance(st, SBlock):
-        _subst_block(st, type_sub)
-
-
-def _subst_expr(e, type_sub: Dict[str, str]) -> None:
-    if isinstance(e, ECall):
-        if e.type_param and e.type_param in type_sub:
-            e.type_param = type_sub[e.type_param]
-        _subst_expr(e.callee, type_sub)
-        for arg in e.args:
-            _subst_expr(arg, type_sub)
-    elif isinstance(e, ETuple):
-        for elem in e.elems:
-            _subst_expr(elem, type_sub)
-    elif isinstance(e, EBinary):
-        _subst_expr(e.lhs, type_sub)
-        _subst_expr(e.rhs, type_sub)
-    elif isinstance(e, EUnary):
-        _subst_expr(e.rhs, type_sub)
-    elif isinstance(e, EMemberAccess):
-        _subst_expr(e.obj, type_sub)
-    elif isinstance(e, EIndex):
-        _subst_expr(e.obj, type_sub)
-        _subst_expr(e.index, type_sub)
-    elif isinstance(e, EListLit):
-        if e.elem_type in type_sub:
-            e.elem_type = type_sub[e.elem_type]
-        for elem in e.elems:
-            _subst_expr(elem, type_sub)
-    elif isinstance(e, EDictLit):
-        if e.val_type in type_sub:
-            e.val_type = type_sub[e.val_type]
-        for k in e.keys:
-            _subst_expr(k, type_sub)
-        for v in e.vals:
-            _subst_expr(v, type_sub)
+    # The substitution is fixed for the whole body, and the same type strings
+    # (List[T], Dict[str,T], ...) recur, so resolve each distinct one only once
+    memo: Dict[str, str] = {}
+
+    def sub(name: str) -> str:
+        r = memo.get(name)
+        if r is None:
+            r = memo[name] = _subst_type_name(name, type_sub)
+        return r
+
+    return FuncDecl(loc=gf.loc, name=mangled_name,
+                    params=[Param(loc=p.loc, name=p.name, ty=_subst_ref(p.ty, sub)) for p in gf.params],
+                    ret=_subst_ref(gf.ret, sub), body=_clone_block(gf.body, sub), type_params=[],
+                    extern_c_name=gf.extern_c_name, doc=gf.doc)
+
+
+# Instantiation clones the template and substitutes its types in one walk.
+# Statements and most expressions get a fresh node (the checker stamps ty/lhs_ty
+# on expressions, and codegen reads them per instantiation -- even an int
+# literal's type depends on its context); SrcLoc and TypeRef are frozen and
+# shared whenever the substitution leaves them unchanged.
+
+def _subst_ref(ref: TypeRef, sub: Callable[[str], str]) -> TypeRef:
+    name = sub(ref.name)
+    return ref if name == ref.name else TypeRef(ref.loc, name)
+
+
+def _clone_block(block: SBlock, sub: Callable[[str], str]) -> SBlock:
+    """Clone a block. Like _check_body, nested blocks (while/for/if/block) are
+    walked with an explicit work stack of (source stmts, target list) pairs
+    rather than recursion; only expressions recurse."""
+    out = SBlock(loc=block.loc, stmts=[])
+    stack: List[Tuple[List[Any], List[Stmt]]] = [(block.stmts, out.stmts)]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        src, dst = pop()
+        for st in src:
+            t = type(st)
+            if t is SIf:
+                arms: List[IfArm] = []
+                for arm in st.arms:
+                    body = SBlock(loc=arm.block.loc, stmts=[])
+                    arms.append(IfArm(loc=arm.loc, cond=_clone_opt_expr(arm.cond, sub), block=body))
+                    push((arm.block.stmts, body.stmts))
+                dst.append(SIf(loc=st.loc, arms=arms))
+            elif t is SWhile:
+                body = SBlock(loc=st.body.loc, stmts=[])
+                dst.append(SWhile(loc=st.loc, cond=_clone_expr(st.cond, sub), body=body))
+                push((st.body.stmts, body.stmts))
+            elif t is SFor:
+                body = SBlock(loc=st.body.loc, stmts=[])
+                dst.append(SFor(loc=st.loc, var_name=st.var_name, var_ty=_subst_ref(st.var_ty, sub),
+                                iterable=_clone_expr(st.iterable, sub), body=body))
+                push((st.body.stmts, body.stmts))
+            elif t is SBlock:
+                body = SBlock(loc=st.loc, stmts=[])
+                dst.append(body)
+                push((st.stmts, body.stmts))
+            else:
+                dst.append(_clone_stmt(st, sub))
+    return out
+
+
+def _clone_stmt(st: Stmt, sub: Callable[[str], str]) -> Stmt:
+    clone = _CLONE_STMT.get(type(st))
+    if clone is None:
+        raise TypeError(st.loc, f"unhandled statement {type(st).__name__}")
+    return clone(st, sub)
+
+
+def _clone_expr(e: Expr, sub: Callable[[str], str]) -> Expr:
+    clone = _CLONE_EXPR.get(type(e))
+    if clone is None:
+        raise TypeError(e.loc, f"unhandled expression {type(e).__name__}")
+    return clone(e, sub)
+
+
+def _clone_opt_expr(e: Optional[Expr], sub: Callable[[str], str]) -> Optional[Expr]:
+    return _clone_expr(e, sub) if e is not None else None
+
+
+def _clone_exprs(es: List[Expr], sub: Callable[[str], str]) -> List[Expr]:
+    return [_clone_expr(e, sub) for e in es]
+
+
+# Per-node-class clone functions, keyed on exact type(). Compound statements are
+# handled by _clone_block itself.
+_CLONE_STMT: Dict[type, Callable[..., Stmt]] = {
+    SVarDecl: lambda st, sub: SVarDecl(
+        loc=st.loc, name=st.name, ty=_subst_ref(st.ty, sub) if st.ty is not None else None,
+        value=_clone_expr(st.value, sub), is_const=st.is_const, is_static=st.is_static),
+    STupleDestructure: lambda st, sub: STupleDestructure(
+        loc=st.loc, names=list(st.names), value=_clone_expr(st.value, sub)),
+    SAssign: lambda st, sub: SAssign(loc=st.loc, name=st.name, op=st.op, value=_clone_expr(st.value, sub)),
+    SMemberAssign: lambda st, sub: SMemberAssign(
+        loc=st.loc, obj=_clone_expr(st.obj, sub), member=st.member, op=st.op, value=_clone_expr(st.value, sub)),
+    SIndexAssign: lambda st, sub: SIndexAssign(
+        loc=st.loc, obj=_clone_expr(st.obj, sub), index=_clone_expr(st.index, sub), op=st.op,
+        value=_clone_expr(st.value, sub)),
+    SExpr: lambda st, sub: SExpr(loc=st.loc, expr=_clone_expr(st.expr, sub)),
+    SReturn: lambda st, sub: SReturn(loc=st.loc, value=_clone_opt_expr(st.value, sub)),
+    SBreak: lambda st, sub: SBreak(loc=st.loc),
+    SContinue: lambda st, sub: SContinue(loc=st.loc),
+}
+
+_CLONE_EXPR: Dict[type, Callable[..., Expr]] = {
+    EVar: lambda e, sub: EVar(loc=e.loc, name=e.name),
+    EInt: lambda e, sub: EInt(loc=e.loc, value=e.value),
+    EFloat: lambda e, sub: EFloat(loc=e.loc, value=e.value),
+    EChar: lambda e, sub: EChar(loc=e.loc, raw=e.raw),
+    # These literals always check to the same type regardless of context, so
+    # every instantiation can share the template's node
+    EString: lambda e, sub: e,
+    EBool: lambda e, sub: e,
+    ENone: lambda e, sub: e,
+    # Most callees are plain names: copy those inline rather than dispatching
+    # (still as a fresh node -- a fn-pointer variable callee gets a ty stamp)
+    ECall: lambda e, sub: ECall(
+        loc=e.loc,
+        callee=EVar(loc=e.callee.loc, name=e.callee.name) if type(e.callee) is EVar else _clone_expr(e.callee, sub),
+        args=_clone_exprs(e.args, sub),
+        type_param=sub(e.type_param) if e.type_param else e.type_param),
+    EMemberAccess: lambda e, sub: EMemberAccess(loc=e.loc, obj=_clone_expr(e.obj, sub), member=e.member),
+    EBinary: lambda e, sub: EBinary(loc=e.loc, op=e.op, lhs=_clone_expr(e.lhs, sub), rhs=_clone_expr(e.rhs, sub)),
+    EUnary: lambda e, sub: EUnary(loc=e.loc, op=e.op, rhs=_clone_expr(e.rhs, sub)),
+    EIndex: lambda e, sub: EIndex(loc=e.loc, obj=_clone_expr(e.obj, sub), index=_clone_expr(e.index, sub)),
+    EIs: lambda e, sub: EIs(loc=e.loc, expr=_clone_expr(e.expr, sub), type_name=e.type_name),
+    EAs: lambda e, sub: EAs(loc=e.loc, expr=_clone_expr(e.expr, sub), type_name=e.type_name),
+    ETuple: lambda e, sub: ETuple(loc=e.loc, elems=_clone_exprs(e.elems, sub)),
+    EListLit: lambda e, sub: EListLit(
+        loc=e.loc, elem_type=sub(e.elem_type) if e.elem_type else e.elem_type, elems=_clone_exprs(e.elems, sub)),
+    EDictLit: lambda e, sub: EDictLit(
+        loc=e.loc, key_type=e.key_type, val_type=sub(e.val_type) if e.val_type else e.val_type,
+        keys=_clone_exprs(e.keys, sub), vals=_clone_exprs(e.vals, sub)),
+}
 
 
 def typecheck(prog: Program, quiet: bool = False) -> None: